@@ -1,6 +1,10 @@
+from operator import itemgetter
+
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+import scipy.sparse as sp
+from scipy.linalg import lstsq
+from scipy.sparse.linalg import LinearOperator, lsqr
 import matplotlib.pyplot as plt
 import seaborn
 from seaborn import stripplot, regplot
@@ -13,6 +17,202 @@ __status__ = "Alpha"
 __date__ = "July 2018"
 
 
+def _total_enthalpy(molecule):
+    """
+    Enthalpy of a molecule, including its electronic energy.
+
+    :param molecule: dict of molecule data
+    :return: float
+    """
+
+    return molecule["enthalpy"] + molecule["energy"]
+
+
+def _count_matrix(counts, columns, dtype=np.int16, sparse=False):
+    """
+    Arrange per-molecule counts (of species, functional groups, etc.) into a
+    matrix, visiting only the labels that each molecule actually has.
+
+    :param counts: list of dicts {label: count}, one per molecule.
+    :param columns: dict {label: column} of the matrix. Labels not in this
+        dict are ignored.
+    :param dtype: Data type of the matrix. Counts are small non-negative
+        integers, so by default np.int16 is used.
+    :param sparse: If True (default False), return a scipy.sparse.csr_matrix,
+        which is worthwhile when each molecule only has a few of the labels.
+    :return: np.ndarray (or csr_matrix) of shape (len(counts), len(columns))
+    """
+
+    # Flatten to (row, column, count) triples, so that the matrix can be
+    # filled with a single scatter rather than one assignment per entry
+    rows = []
+    cols = []
+    vals = []
+    get_column = columns.get
+    add_row = rows.append
+    add_col = cols.append
+    add_val = vals.append
+    for i, mol_counts in enumerate(counts):
+        for label, count in mol_counts.items():
+            j = get_column(label)
+            if j is not None:
+                add_row(i)
+                add_col(j)
+                add_val(count)
+
+    shape = (len(counts), len(columns))
+    rows = np.array(rows, dtype=int)
+    cols = np.array(cols, dtype=int)
+
+    if sparse:
+        return sp.csr_matrix((np.array(vals, dtype=dtype), (rows, cols)),
+                             shape=shape)
+
+    matrix = np.zeros(shape, dtype=dtype)
+    matrix[rows, cols] = vals
+
+    return matrix
+
+
+def _reaction_difference(mol_values, pro_idx, rct_idx, rct_starts, has_rct):
+    """
+    Compute a reaction feature (product minus the sum of the reactants) from
+    the corresponding molecule feature, for all reactions at once.
+
+    The index arrays depend only on the dataset, not on the feature, so they
+    are built once (see MolThermAnalyzer._setup_dataset) and shared between
+    all features.
+
+    :param mol_values: np.ndarray (or scipy.sparse matrix) with one row (or
+        value) per molecule.
+    :param pro_idx: np.ndarray with the row of the product of each reaction.
+    :param rct_idx: np.ndarray with the row of every reactant, for all
+        reactions in turn.
+    :param rct_starts: np.ndarray with the position in rct_idx of the first
+        reactant of each reaction that has any reactants.
+    :param has_rct: np.ndarray of bools, True for reactions with at least one
+        reactant.
+    :return: np.ndarray (or scipy.sparse.csr_matrix, if mol_values is sparse)
+        with one row (or value) per reaction.
+    """
+
+    if sp.issparse(mol_values):
+        # Sparse matrices don't support reduceat; instead, multiply by a
+        # signed incidence matrix (+1 for the product, -1 for each reactant)
+        num_reactions = len(pro_idx)
+        rct_rxn = np.repeat(np.flatnonzero(has_rct),
+                            np.diff(np.append(rct_starts, len(rct_idx))))
+        incidence = sp.csr_matrix(
+            (np.concatenate([np.ones(num_reactions, dtype=np.int32),
+                             -np.ones(len(rct_idx), dtype=np.int32)]),
+             (np.concatenate([np.arange(num_reactions), rct_rxn]),
+              np.concatenate([pro_idx, rct_idx]))),
+            shape=(num_reactions, mol_values.shape[0]))
+        return incidence.dot(mol_values).tocsr()
+
+    diff = mol_values[pro_idx]
+    if np.issubdtype(diff.dtype, np.integer):
+        # Integer counts are widened so that differences can't overflow
+        diff = diff.astype(np.promote_types(diff.dtype, np.int32))
+
+    if len(rct_idx):
+        # Reactions without reactants are left out of rct_starts, since
+        # reduceat would otherwise return the next reactant for them
+        diff[has_rct] -= np.add.reduceat(mol_values[rct_idx], rct_starts,
+                                         axis=0, dtype=diff.dtype)
+
+    return diff
+
+
+def _list_array(lists):
+    """
+    Store lists (for instance, the molecule ids of each reaction) in a 1D
+    object array. Unlike np.array, this does not depend on whether all of the
+    lists have the same length.
+
+    :param lists: list of lists
+    :return: np.ndarray of shape (len(lists),)
+    """
+
+    array = np.empty(len(lists), dtype=object)
+    for i, entry in enumerate(lists):
+        array[i] = entry
+
+    return array
+
+
+def _append_rows(matrix, rows):
+    """
+    Append rows to a feature array, which may be sparse.
+
+    :param matrix: np.ndarray or scipy.sparse matrix
+    :param rows: np.ndarray or scipy.sparse matrix with the same number of
+        columns as matrix
+    :return: np.ndarray, or scipy.sparse.csr_matrix if matrix is sparse
+    """
+
+    if sp.issparse(matrix):
+        return sp.vstack([matrix, rows], format="csr", dtype=matrix.dtype)
+
+    return np.concatenate([matrix, rows])
+
+
+def _fit_linear(in_matrix, dep_matrix):
+    """
+    Ordinary least squares fit with an intercept, equivalent to
+    sklearn.linear_model.LinearRegression.
+
+    The data are centered so that the intercept can be recovered in closed
+    form, and the system is solved with LAPACK's gelsy driver, which is
+    cheaper than the default gelsd for the small, often rank-deficient,
+    matrices used here. Sparse inputs are centered implicitly and solved
+    with LSQR, as LinearRegression does, so that they are never densified.
+    The input arrays are not modified.
+
+    :param in_matrix: np.ndarray (or scipy.sparse matrix) of shape
+        (samples, features)
+    :param dep_matrix: np.ndarray of shape (samples, 1)
+    :return: tuple (coefficients, intercept, r_squared), where coefficients
+        has shape (1, features) and intercept has shape (1,)
+    """
+
+    dep_mean = dep_matrix.mean(axis=0)
+
+    if sp.issparse(in_matrix):
+        in_matrix = in_matrix.tocsr().astype(np.float64)
+        in_mean = np.asarray(in_matrix.mean(axis=0)).ravel()
+
+        centered = LinearOperator(
+            in_matrix.shape, dtype=np.float64,
+            matvec=lambda v: in_matrix.dot(v).ravel() - in_mean.dot(v),
+            rmatvec=lambda v: in_matrix.T.dot(v).ravel() - in_mean * v.sum())
+
+        solution = lsqr(centered, (dep_matrix - dep_mean).ravel(),
+                        atol=1e-12, btol=1e-12)[0].reshape(-1, 1)
+        predicted = in_matrix.dot(solution)
+    else:
+        in_mean = in_matrix.mean(axis=0)
+
+        solution = lstsq(in_matrix - in_mean, dep_matrix - dep_mean,
+                         lapack_driver="gelsy")[0]
+        predicted = in_matrix.dot(solution)
+
+    coefficients = solution.T
+    intercept = dep_mean - in_mean.dot(solution)
+
+    residuals = dep_matrix - predicted - intercept
+    ss_res = (residuals ** 2).sum()
+    ss_tot = ((dep_matrix - dep_mean) ** 2).sum()
+
+    if ss_tot == 0:
+        # Constant dependent variable; as in sklearn's r2_score
+        r_squared = 1.0 if ss_res == 0 else 0.0
+    else:
+        r_squared = 1 - ss_res / ss_tot
+
+    return coefficients, intercept, r_squared
+
+
 class MolThermAnalyzer:
     """
     This class performs analysis based on the data obtained from
@@ -20,7 +220,7 @@ class MolThermAnalyzer:
     """
 
     def __init__(self, dataset, setup=True, in_features=None, dep_features=None,
-                 func_groups=None, species=None):
+                 func_groups=None, species=None, dtype=np.float64):
         """
         :param dataset: A list of dicts representing all data necessary to
             represent a reaction.
@@ -33,8 +233,14 @@ class MolThermAnalyzer:
         :param func_groups: list of str representations of functional groups
         :param species: list of str representations of species present in the
             dataset
+        :param dtype: NumPy data type for continuous features (enthalpy,
+            molecular weight, etc.). Default is np.float64; np.float32 halves
+            memory use, at the cost of precision for large absolute values
+            such as molecular enthalpies in J/mol.
         """
 
+        self.dtype = dtype
+
         if in_features is None:
            self.in_features = ["number_atoms", "molecular_weight", "tpsa",
                                "double_bonds", "triple_bonds", "species",
@@ -53,6 +259,8 @@ class MolThermAnalyzer:
             else:
                 self.species = ["C", "H", "O", "N", "S", "P", "F", "Cl", "Br",
                                 "I"]
+        else:
+            self.species = species
 
         if func_groups is None:
             if setup:
@@ -62,11 +270,21 @@ class MolThermAnalyzer:
         else:
             self.func_groups = func_groups
 
+        # Column of each species and functional group in the feature matrices
+        self._species_col = {s: j for j, s in enumerate(self.species)}
+        self._fg_col = {g: j for j, g in enumerate(self.func_groups)}
+
+        # Row of each molecule id in the molecule features (see add_reaction)
+        self._id2row = None
+
         if setup:
             self.dataset = self._setup_dataset(dataset)
         else:
             self.dataset = dataset
 
+        # Regression inputs, keyed by features (see _get_matrices)
+        self._matrices = {}
+
     @staticmethod
     def _setup_func_groups(dataset):
         """
@@ -118,105 +336,237 @@ class MolThermAnalyzer:
 
         new_dset = {"molecules": {}, "reactions": {}}
 
-        all_molecules = []
-
         num_reactions = len(dataset)
 
-        for datapoint in dataset:
-            if datapoint["product"] not in all_molecules:
-                all_molecules.append(datapoint["product"])
-
-            for rct in datapoint["reactants"]:
-                if rct not in all_molecules:
-                    all_molecules.append(rct)
+        # Flatten the molecules of all reactions (each product followed by its
+        # reactants), and find the row of each among the unique molecules, so
+        # that reaction features can be computed from molecule features with
+        # array operations
+        flat_molecules = [m for r in dataset
+                          for m in [r["product"]] + r["reactants"]]
+        num_reactants = np.array([len(r["reactants"]) for r in dataset],
+                                 dtype=int)
+
+        _, first, inverse = np.unique([m["mol_id"] for m in flat_molecules],
+                                      return_index=True, return_inverse=True)
+
+        # np.unique sorts by id; renumber the rows so that molecules shared
+        # between reactions appear once, in the order in which they first
+        # appear
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        rows = rank[inverse.ravel()]
+
+        all_molecules = [flat_molecules[k] for k in first[order]]
+
+        pro_pos = np.cumsum(num_reactants + 1) - (num_reactants + 1)
+        is_pro = np.zeros(len(flat_molecules), dtype=bool)
+        is_pro[pro_pos] = True
+
+        pro_idx = rows[is_pro]
+        rct_idx = rows[~is_pro]
+        has_rct = num_reactants > 0
+        rct_starts = (np.cumsum(num_reactants) - num_reactants)[has_rct]
+
+        mol_dset = new_dset["molecules"]
+        rxn_dset = new_dset["reactions"]
+
+        # dtype is given so that an empty dataset still has str ids
+        mol_dset["ids"] = np.array([m["mol_id"] for m in all_molecules],
+                                   dtype=str)
+        rxn_dset["ids"] = _list_array([p["mol_ids"] for p in dataset])
+        if num_reactions:
+            rxn_dset["dirs"] = np.array([p["dir_name"] for p in dataset])
+        else:
+            rxn_dset["dirs"] = np.array([], dtype=str)
 
-        new_dset["molecules"]["ids"] = np.array([m["mol_id"] for m in all_molecules])
-        new_dset["reactions"]["ids"] = np.array([p["mol_ids"] for p in dataset])
-        new_dset["reactions"]["dirs"] = np.array([p["dir_name"] for p in dataset])
+        # Row of each molecule, so that reactions can be added later
+        self._id2row = {m["mol_id"]: i for i, m in enumerate(all_molecules)}
 
-        num_molecules = len(all_molecules)
+        thermos = [r["thermo"] for r in dataset]
 
         # Vectorize molecule and reaction features, including thermodynamic
         # properties, surface area, etc.
         for marker in (self.in_features + self.dep_features):
             # Fill dataset for molecules
-            if marker == "species":
-                new_dset["molecules"][marker] = np.zeros((num_molecules,
-                                                         len(self.species)))
-            elif marker == "functional_groups":
-                new_dset["molecules"][marker] = np.zeros((num_molecules,
-                                                          len(self.func_groups)))
-            else:
-                new_dset["molecules"][marker] = np.zeros(num_molecules)
-
-            for i, mol in enumerate(all_molecules):
-                if marker == "enthalpy":
-                    new_dset["molecules"][marker][i] = mol["enthalpy"] + mol["energy"]
-                elif marker == "t_star":
-                    # Turning temperature is not defined for individual molecules
-                    continue
-                elif marker == "species":
-                    for j, spe in enumerate(self.species):
-                        if spe in mol["species"].keys():
-                            new_dset["molecules"]["species"][i, j] = mol["species"][spe]
-                elif marker == "functional_groups":
-                    for j, grp in enumerate(self.func_groups):
-                        if grp in mol["functional_groups"].keys():
-                            new_dset["molecules"]["functional_groups"][i, j] = \
-                            mol["functional_groups"][grp]["count"]
-                else:
-                    new_dset["molecules"][marker][i] = mol[marker]
+            mol_values = self._molecule_values(marker, all_molecules)
+            mol_dset[marker] = mol_values
 
             # Now fill dataset for reactions
-
-            if marker == "species":
-                new_dset["reactions"][marker] = np.zeros((num_reactions,
-                                                          len(self.species)))
-            elif marker == "functional_groups":
-                new_dset["reactions"][marker] = np.zeros((num_reactions,
-                                                          len(self.func_groups)))
+            # Reaction thermo is used where available; otherwise, take the
+            # difference between the product and the reactants
+            thermo_values = [t.get(marker) for t in thermos]
+            has_thermo = np.array([v is not None for v in thermo_values],
+                                  dtype=bool)
+
+            if num_reactions and has_thermo.all():
+                rxn_values = np.array(thermo_values, dtype=self.dtype)
             else:
-                new_dset["reactions"][marker] = np.zeros(num_reactions)
-
-            for i, react in enumerate(dataset):
-                thermo = react["thermo"]
-                pro = react["product"]
-                rcts = react["reactants"]
-                if marker in thermo.keys():
-                    new_dset["reactions"][marker][i] = thermo[marker]
-                elif marker == "species":
-                    pro_species = np.zeros(len(self.species))
-                    rct_species = np.zeros(len(self.species))
-
-                    for j, spe in enumerate(self.func_groups):
-                        if spe in react["product"]["species"].keys():
-                            pro_species[j] = react["product"]["species"][spe]
-
-                        for mol in react["reactants"]:
-                            if spe in mol["species"].keys():
-                                rct_species[j] += mol["species"][spe]
-
-                    new_dset["reactions"]["species"][i] = pro_species - rct_species
-                elif marker == "functional_groups":
-                    pro_grps = np.zeros(len(self.func_groups))
-                    rct_grps = np.zeros(len(self.func_groups))
-
-                    for j, grp in enumerate(self.func_groups):
-                        if grp in react["product"]["functional_groups"].keys():
-                            pro_grps[j] = react["product"]["functional_groups"][grp]["count"]
-
-                        for mol in react["reactants"]:
-                            if grp in mol["functional_groups"].keys():
-                                rct_grps[j] += mol["functional_groups"][grp]["count"]
-
-                    new_dset["reactions"]["functional_groups"][i] = pro_grps - rct_grps
-                else:
-                    pro_data = pro[marker]
-                    rct_data = sum(rct[marker] for rct in rcts)
-                    new_dset["reactions"][marker][i] = pro_data - rct_data
+                if marker in ("enthalpy", "t_star"):
+                    # The molecule values above are not plain differences
+                    mol_values = self._molecule_values(marker, all_molecules,
+                                                       raw=True)
+
+                rxn_values = _reaction_difference(mol_values, pro_idx, rct_idx,
+                                                  rct_starts, has_rct)
+                if has_thermo.any():
+                    rxn_values[has_thermo] = [v for v in thermo_values
+                                              if v is not None]
+
+            rxn_dset[marker] = rxn_values
 
         return new_dset
 
+    def _molecule_values(self, marker, molecules, raw=False):
+        """
+        Vectorize one feature of a set of molecules.
+
+        :param marker: str representing a feature (species, enthalpy, etc.)
+        :param molecules: list of dicts representing molecules
+        :param raw: If True, read enthalpy and t_star as stored in each
+            molecule, rather than as used in the molecule dataset (enthalpy
+            including electronic energy; t_star undefined, so zero).
+        :return: np.ndarray with one row (or value) per molecule
+        """
+
+        if marker == "species":
+            return _count_matrix([m["species"] for m in molecules],
+                                 self._species_col)
+        elif marker == "functional_groups":
+            # Most molecules have few of the possible functional groups
+            return _count_matrix(
+                [{g: v["count"] for g, v in m["functional_groups"].items()}
+                 for m in molecules], self._fg_col, sparse=True)
+        elif marker == "t_star" and not raw:
+            # Turning temperature is not defined for individual molecules
+            return np.zeros(len(molecules), dtype=self.dtype)
+
+        # Choose how to read the value once per marker, rather than once per
+        # molecule
+        if marker == "enthalpy" and not raw:
+            extract = _total_enthalpy
+        else:
+            extract = itemgetter(marker)
+
+        return np.fromiter(map(extract, molecules), dtype=self.dtype,
+                           count=len(molecules))
+
+    def add_reaction(self, datapoint):
+        """
+        Add one reaction to a dataset that has already been set up, without
+        rebuilding the whole dataset. Molecules that are not yet in the dataset
+        are appended to the molecule features.
+
+        Species and functional groups are fixed when the analyzer is created;
+        any that are not in self.species or self.func_groups are ignored.
+
+        :param datapoint: dict representing a reaction, in the same format as
+            the entries of the dataset passed to __init__.
+        :return:
+        """
+
+        mol_dset = self.dataset["molecules"]
+        rxn_dset = self.dataset["reactions"]
+
+        if self._id2row is None:
+            self._id2row = {m: i for i, m in enumerate(mol_dset["ids"].tolist())}
+
+        molecules = [datapoint["product"]] + datapoint["reactants"]
+
+        new_molecules = []
+        for molecule in molecules:
+            if molecule["mol_id"] not in self._id2row:
+                self._id2row[molecule["mol_id"]] = len(self._id2row)
+                new_molecules.append(molecule)
+
+        if new_molecules:
+            mol_dset["ids"] = np.concatenate(
+                [mol_dset["ids"], [m["mol_id"] for m in new_molecules]])
+        rxn_dset["ids"] = np.concatenate(
+            [rxn_dset["ids"], _list_array([datapoint["mol_ids"]])])
+        rxn_dset["dirs"] = np.concatenate([rxn_dset["dirs"],
+                                           [datapoint["dir_name"]]])
+
+        for marker in (self.in_features + self.dep_features):
+            if new_molecules:
+                mol_dset[marker] = _append_rows(
+                    mol_dset[marker],
+                    self._molecule_values(marker, new_molecules))
+
+            # As in _setup_dataset, reaction thermo is used where available
+            rxn_dtype = rxn_dset[marker].dtype
+            value = datapoint["thermo"].get(marker)
+            if value is None:
+                # The product is the first of the molecules
+                values = self._molecule_values(
+                    marker, molecules, raw=marker in ("enthalpy", "t_star"))
+                has_rct = np.array([len(molecules) > 1])
+                row = _reaction_difference(values, np.array([0]),
+                                           np.arange(1, len(molecules)),
+                                           np.array([0])[has_rct], has_rct)
+                row = row.astype(rxn_dtype)
+            else:
+                row = np.array([value], dtype=rxn_dtype)
+
+            rxn_dset[marker] = _append_rows(rxn_dset[marker], row)
+
+        # Cached regression inputs no longer cover the whole dataset
+        self._matrices = {}
+
+    def _get_matrices(self, in_features, dep_feature, molecules=False):
+        """
+        Assemble the independent and dependent variables of a regression as
+        arrays. The arrays are cached, since the dataset does not change after
+        setup and the same regression is often repeated.
+
+        :param in_features: list of strs representing independent variables
+        :param dep_feature: str representing a dependent variable
+        :param molecules: If True, use individual molecules rather than
+            reactions
+        :return: tuple (in_matrix, dep_matrix, names), where names labels the
+            columns of in_matrix. in_matrix is a scipy.sparse.csr_matrix if it
+            includes functional groups. These arrays should not be modified.
+        """
+
+        key = (tuple(in_features), dep_feature, molecules)
+
+        if key in self._matrices:
+            return self._matrices[key]
+
+        if molecules:
+            data = self.dataset["molecules"]
+        else:
+            data = self.dataset["reactions"]
+
+        # Species and functional groups contribute one column per label
+        columns = []
+        names = []
+        for feat in in_features:
+            if not (feat == "species" or feat == "functional_groups"):
+                columns.append(data[feat])
+                names.append(feat)
+        if "species" in in_features:
+            columns.append(data["species"])
+            names.extend(np.asarray(self.species).tolist())
+        if "functional_groups" in in_features:
+            columns.append(data["functional_groups"])
+            names.extend(np.asarray(self.func_groups).tolist())
+
+        if any(sp.issparse(c) for c in columns):
+            # Keep the regression input sparse; scalar features become single
+            # columns
+            in_matrix = sp.hstack(
+                [c if sp.issparse(c) else np.reshape(c, (len(c), -1))
+                 for c in columns], format="csr")
+        else:
+            in_matrix = np.column_stack(columns)
+        dep_matrix = np.asarray(data[dep_feature]).reshape(-1, 1)
+
+        self._matrices[key] = (in_matrix, dep_matrix, names)
+
+        return self._matrices[key]
+
     def analyze_features(self, in_features, dep_feature, molecules=False):
         """
         Perform a regression analysis to determine the effect of various
@@ -232,50 +582,13 @@ class MolThermAnalyzer:
         :return: dict of statistical values
         """
 
-        if molecules:
-            in_dataset = {feat: self.dataset["molecules"][feat] for feat in
-                          in_features if not (feat == "species" or
-                                              feat == "functional_groups")}
-            if "species" in in_features:
-                species = {s: self.dataset["molecules"]["species"][:, i]
-                           for i, s in enumerate(self.species)}
-                in_dataset.update(species)
-            if "functional_groups" in in_features:
-                func_grps = {f: self.dataset["molecules"]["functional_groups"][:, i]
-                           for i, f in enumerate(self.func_groups)}
-                in_dataset.update(func_grps)
-
-            in_frame = pd.DataFrame(data=in_dataset)
-            dep_frame = pd.DataFrame(self.dataset["molecules"][dep_feature],
-                                     columns=[dep_feature])
-
-        else:
-            in_dataset = {feat: self.dataset["reactions"][feat] for feat in
-                          in_features if not (feat == "species" or
-                                              feat == "functional_groups")}
-
-            if "species" in in_features:
-                species = {s: self.dataset["reactions"]["species"][:, i]
-                           for i, s in enumerate(self.species)}
-                in_dataset.update(species)
-            if "functional_groups" in in_features:
-                func_grps = {f: self.dataset["reactions"]["functional_groups"][:, i]
-                           for i, f in enumerate(self.func_groups)}
-                in_dataset.update(func_grps)
-
-            in_frame = pd.DataFrame(data=in_dataset)
-            dep_frame = pd.DataFrame(self.dataset["reactions"][dep_feature],
-                                     columns=[dep_feature])
-
-        lm = LinearRegression()
-        lm.fit(in_frame, dep_frame)
+        in_matrix, dep_matrix, names = self._get_matrices(in_features,
+                                                          dep_feature,
+                                                          molecules)
 
-        score = lm.score(in_frame, dep_frame)
-        coefficients = lm.coef_
-        intercept = lm.intercept_
+        coefficients, intercept, score = _fit_linear(in_matrix, dep_matrix)
 
-        coefficients = {e: coefficients[0][i] for i, e in
-                        enumerate(in_frame.columns.values.tolist())}
+        coefficients = {e: coefficients[0][i] for i, e in enumerate(names)}
 
         return {"r_squared": score,
                 "coefficients": coefficients,
@@ -298,22 +611,24 @@ class MolThermAnalyzer:
 
         seaborn.set(style="ticks", color_codes=True)
 
-        if in_feature in self.species:
-            col = np.where(self.species == in_feature)[0][0]
+        if in_feature in self._species_col:
+            col = self._species_col[in_feature]
             if molecules:
                 in_data = self.dataset["molecules"]["species"][:, col]
                 dep_data = self.dataset["molecules"][dep_feature]
             else:
                 in_data = self.dataset["reactions"]["species"][:, col]
                 dep_data = self.dataset["reactions"][dep_feature]
-        elif in_feature in self.func_groups:
-            col = np.where(self.func_groups == in_feature)[0][0]
+        elif in_feature in self._fg_col:
+            col = self._fg_col[in_feature]
             if molecules:
                 in_data = self.dataset["molecules"]["functional_groups"][:, col]
                 dep_data = self.dataset["molecules"][dep_feature]
             else:
                 in_data = self.dataset["reactions"]["functional_groups"][:, col]
                 dep_data = self.dataset["reactions"][dep_feature]
+            if sp.issparse(in_data):
+                in_data = in_data.toarray().ravel()
         else:
             if molecules:
                 in_data = self.dataset["molecules"][in_feature]
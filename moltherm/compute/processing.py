@@ -1,11 +1,21 @@
-from os import listdir
-from os.path import join, isfile, isdir, abspath
+from os import scandir, stat, cpu_count, SEEK_END
+from os.path import join, isabs, abspath, splitext
 import shutil
-from collections import Counter
+import copy
+import mmap
+import logging
+from collections import Counter, defaultdict
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import re
 
+import numpy as np
+from pymongo.errors import OperationFailure, PyMongoError
 import networkx as nx
 
+from monty.io import zopen
+
 from pymatgen.core.structure import Molecule
 from pymatgen.analysis.functional_groups import FunctionalGroupExtractor
 from pymatgen.io.babel import BabelMolAdaptor
@@ -13,7 +23,6 @@ from pymatgen.io.babel import BabelMolAdaptor
 from atomate.qchem.database import QChemCalcDb
 
 from moltherm.compute.drones import MolThermDrone
-from moltherm.compute.outputs import QCOutput
 from moltherm.compute.utils import get_molecule, extract_id, associate_qchem_to_mol
 
 __author__ = "Evan Spotte-Smith"
@@ -23,6 +32,382 @@ __email__ = "espottesmith@gmail.com"
 __status__ = "Alpha"
 __date__ = "August 2018"
 
+logger = logging.getLogger(__name__)
+
+
+# Fields of QCOutput.data needed to compute reaction thermodynamics
+THERMO_FIELDS = ("enthalpy", "entropy", "final_energy", "final_energy_sp")
+
+
+def _scan(path):
+    """
+    List the contents of a directory with a single scandir pass, so that
+    regular files can be identified without an additional stat() per entry.
+
+    :param path: Path to a directory.
+    :return: tuple (all_names, file_names), where all_names contains every
+        entry in the directory and file_names only the regular files.
+    """
+
+    all_names = []
+    file_names = []
+
+    with scandir(path) as entries:
+        for entry in entries:
+            all_names.append(entry.name)
+            if entry.is_file():
+                file_names.append(entry.name)
+
+    return all_names, file_names
+
+
+def _file_key(path):
+    """
+    Key identifying the current contents of a file (or directory listing),
+    for caching: files that are rewritten get a new key.
+
+    :param path: Path to a file or directory.
+    :return: tuple (absolute path, modification time in ns)
+    """
+
+    path = abspath(path)
+    return path, stat(path).st_mtime_ns
+
+
+# Normalized job kind for each task type recorded in the database
+TASK_KINDS = {"opt": "opt", "optimization": "opt",
+              "freq": "freq", "frequency": "freq",
+              "sp": "sp"}
+
+
+@lru_cache(maxsize=None)
+def _output_kind(filename):
+    """
+    Determine which kind of job a QChem output file belongs to from its name
+    (for instance, rct_0.out.freq_0 is a frequency job).
+
+    :param filename: Name of a QChem output file.
+    :return: str ("freq", "opt", or "sp"), or None if the kind cannot be
+        determined.
+    """
+
+    # Outputs are usually named <molecule>.out.<kind>[_<n>][_copy], so the
+    # kind can be read off the end of the name
+    _, sep, suffix = filename.rpartition(".out.")
+    if sep:
+        kind = suffix.split("_", 1)[0]
+        if kind in ("freq", "opt", "sp"):
+            return kind
+
+    for kind in ("freq", "opt", "sp"):
+        if kind in filename:
+            return kind
+
+    return None
+
+
+# Field that each collection is queried by, and so should be indexed on
+INDEXED_FIELDS = {"molecules": "mol_id", "thermo": "dir_name"}
+
+# Fields of molecule documents needed to summarize jobs and compute thermo
+THERMO_DB_PROJECTION = {"mol_id": 1,
+                        "calcs_reversed.task.type": 1,
+                        "calcs_reversed.enthalpy": 1,
+                        "calcs_reversed.entropy": 1,
+                        "calcs_reversed.final_energy_sp": 1,
+                        "calcs_reversed.input.rem.method": 1,
+                        "calcs_reversed.input.rem.basis": 1,
+                        "calcs_reversed.input.rem.solvent_method": 1,
+                        "calcs_reversed.input.smx": 1,
+                        "calcs_reversed.input.solvent": 1}
+
+# Fields of molecule documents needed by get_molecule_data
+MOLECULE_DATA_PROJECTION = {"mol_id": 1,
+                            "calcs_reversed.task.name": 1,
+                            "calcs_reversed.enthalpy": 1,
+                            "calcs_reversed.entropy": 1,
+                            "calcs_reversed.final_energy_sp": 1,
+                            "calcs_reversed.molecule_from_optimized_geometry": 1}
+
+# Unit conversions applied to (energy, enthalpy, entropy) sums:
+# Hartree -> kcal/mol for energy, cal/mol-K -> J/mol-K for entropy
+THERMO_UNITS = np.array([627.509, 1.0, 4.184])
+
+
+def _combine_thermo(pro_sums, rct_sums):
+    """
+    Combine the summed thermo of the products and reactants of a reaction
+    into the reaction enthalpy and entropy.
+
+    Both arguments hold (energy, enthalpy, entropy) along their last axis, in
+    Hartree, kcal/mol, and cal/mol-K, as reported by QChem. Arrays of shape
+    (n, 3) can be passed to combine n reactions at once.
+
+    :param pro_sums: np.ndarray of summed product thermo.
+    :param rct_sums: np.ndarray of summed reactant thermo.
+    :return: tuple (enthalpy, entropy) of np.ndarrays, in J/mol and J/mol-K.
+    """
+
+    delta = (np.asarray(pro_sums) - np.asarray(rct_sums)) * THERMO_UNITS
+    # Electronic energy is included in the enthalpy (both in kcal/mol here)
+    enthalpy = (delta[..., 0] + delta[..., 1]) * 1000 * 4.184
+    entropy = delta[..., 2]
+
+    return enthalpy, entropy
+
+
+# Same patterns that QCOutput uses for these fields
+_THERMO_RE = re.compile(
+    rb"Total Enthalpy:\s+(?P<enthalpy>[\d\-\.]+)\s+kcal/mol"
+    rb"|Total Entropy:\s+(?P<entropy>[\d\-\.]+)\s+cal/mol\.K"
+    rb"|Final\senergy\sis\s+(?P<final_energy>[\d\-\.]+)"
+    rb"|SCF\s+energy in the final basis set\s+=\s*(?P<final_energy_sp>[\d\-\.]+)")
+_ATOM_ROW_RE = re.compile(
+    r"\s*\d+\s+([a-zA-Z]+)\s*[\d\-\.]+\s*[\d\-\.]+\s*[\d\-\.]+")
+
+
+# Extensions of compressed files, which zopen (and so QCOutput) decompresses
+COMPRESSED_EXTENSIONS = (".bz2", ".gz", ".z", ".xz", ".lzma")
+
+
+@contextmanager
+def _output_bytes(path):
+    """
+    Open a QChem output file for regex searches. Plain files are memory-mapped,
+    so that they don't have to be read into memory; compressed files are
+    decompressed with zopen, as in QCOutput.
+
+    :param path: Path to a QChem output file.
+    :return: bytes-like object with the contents of the file.
+    """
+
+    if splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+        with zopen(path, "rb") as file:
+            yield file.read()
+        return
+
+    with open(path, "rb") as file:
+        try:
+            text = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            text = None
+
+        if text is None:
+            yield b""
+        else:
+            with text:
+                yield text
+
+
+def _scrape_fields(path):
+    """
+    Read the thermo fields (see THERMO_FIELDS) from a QChem output file with
+    a single regex pass, without parsing the rest of the output.
+
+    As in QCOutput, the first match is used for enthalpy, entropy, and
+    final_energy, and the last match for final_energy_sp.
+
+    :param path: Path to a QChem output file, which may be compressed.
+    :return: dict {field: float or None}
+    """
+
+    fields = {field: None for field in THERMO_FIELDS}
+
+    with _output_bytes(path) as text:
+        for match in _THERMO_RE.finditer(text):
+            field = match.lastgroup
+            if fields[field] is None or field == "final_energy_sp":
+                fields[field] = float(match.group(field))
+
+    return fields
+
+
+# Printed by QChem when a job finishes; see QCOutput
+_COMPLETION_RE = re.compile(
+    rb"Thank you very much for using Q-Chem.\s+Have a nice day.")
+
+# Number of bytes at the end of an output file to check for completion
+_COMPLETION_TAIL = 8192
+
+
+def _scrape_completion(path):
+    """
+    Determine whether a QChem job finished, without parsing the output.
+
+    The completion message is printed at the very end of an output, so only
+    the tail of a plain file is usually read. The rest of the file is only
+    searched if the message is not found there. Compressed files can't be
+    read from the end, and are searched in full.
+
+    :param path: Path to a QChem output file, which may be compressed.
+    :return: bool
+    """
+
+    if splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+        with _output_bytes(path) as text:
+            return _COMPLETION_RE.search(text) is not None
+
+    with open(path, "rb") as file:
+        file.seek(0, SEEK_END)
+        size = file.tell()
+        file.seek(max(0, size - _COMPLETION_TAIL))
+
+        if _COMPLETION_RE.search(file.read()) is not None:
+            return True
+        if size <= _COMPLETION_TAIL:
+            return False
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as text:
+            return _COMPLETION_RE.search(text) is not None
+
+
+def _scrape_initial_species(path):
+    """
+    Read the species of the initial molecule (the first "Standard Nuclear
+    Orientation" table) from a QChem output file. Reading stops at the end
+    of the table.
+
+    :param path: Path to a QChem output file, which may be compressed.
+    :return: tuple of str, or None if no geometry could be found.
+    """
+
+    species = []
+
+    with zopen(path, "rt") as file:
+        for line in file:
+            if "Standard Nuclear Orientation (Angstroms)" in line:
+                break
+        else:
+            return None
+
+        # Skip column labels and separator
+        next(file, None)
+        next(file, None)
+
+        for line in file:
+            match = _ATOM_ROW_RE.match(line)
+            if match is None:
+                break
+            species.append(match.group(1))
+
+    return tuple(species) or None
+
+
+# Smallest number of new structures for which descriptors are computed in
+# worker processes; below this, starting the workers costs more than it saves
+MIN_PARALLEL_DESCRIPTORS = 32
+
+
+def _descriptor_key(molecule):
+    """
+    Key identifying a molecule's structure, for caching its descriptors.
+
+    :param molecule: Molecule.
+    :return: tuple (species, coordinates)
+    """
+
+    return (tuple(str(s) for s in molecule.species),
+            molecule.cart_coords.tobytes())
+
+
+def _molecule_descriptors(molecule):
+    """
+    Compute the descriptors of a molecule that require Open Babel or a
+    molecule graph: molecular weight, topological polar surface area,
+    functional groups, and the number of double and triple bonds.
+
+    :param molecule: Molecule.
+    :return: dict {descriptor: value}
+    """
+
+    descriptors = {}
+
+    adaptor = BabelMolAdaptor(molecule)
+    pbmol = adaptor.pybel_mol
+
+    descriptors["molecular_weight"] = pbmol.molwt
+    descriptors["tpsa"] = pbmol.calcdesc()["TPSA"]
+
+    extractor = FunctionalGroupExtractor(molecule)
+    molgraph = extractor.molgraph
+    func_grps = extractor.get_all_functional_groups()
+
+    descriptors["functional_groups"] = extractor.categorize_functional_groups(func_grps)
+
+    weights = nx.get_edge_attributes(molgraph.graph, "weight")
+    bonds_checked = set()
+    double_bonds = 0
+    triple_bonds = 0
+    for bond, weight in weights.items():
+        # Remove index from multidigraph
+        bond = (bond[0], bond[1])
+        if int(weight) == 2 and bond not in bonds_checked:
+            double_bonds += 1
+        elif int(weight) == 3 and bond not in bonds_checked:
+            triple_bonds += 1
+        bonds_checked.add(bond)
+
+    descriptors["double_bonds"] = double_bonds
+    descriptors["triple_bonds"] = triple_bonds
+
+    return descriptors
+
+
+def _extract_calc_params(calc):
+    """
+    Summarize the level of theory used for a single calculation.
+
+    :param calc: dict representing one entry of a task's calcs_reversed.
+    :return: dict {"method", "basis", "solvent_method", "solvent"}
+    """
+
+    rem = calc["input"]["rem"]
+    solvent_method = rem.get("solvent_method", None)
+
+    if solvent_method == "smd":
+        if calc["input"]["smx"] is None:
+            solvent = None
+        else:
+            solvent = calc["input"]["smx"]["solvent"]
+    elif solvent_method == "pcm":
+        solvent = calc["input"]["solvent"]
+    else:
+        solvent = None
+
+    return {"method": rem["method"],
+            "basis": rem["basis"],
+            "solvent_method": solvent_method,
+            "solvent": solvent}
+
+
+def _find_job_params(records, params):
+    """
+    Fill in the level of theory of each kind of job (see TASK_KINDS) from the
+    first calculation of that kind, stopping as soon as every kind is known.
+
+    :param records: List of molecule documents, each with calcs_reversed.
+    :param params: dict {kind: dict or None}. Kinds that are not None are
+        left unchanged.
+    :return: dict {kind: dict or None}
+    """
+
+    params = dict(params)
+    remaining = {k for k, v in params.items() if v is None}
+
+    for record in records:
+        if not remaining:
+            break
+        for calc in record["calcs_reversed"]:
+            kind = TASK_KINDS.get(calc["task"]["type"])
+            if kind in remaining:
+                params[kind] = _extract_calc_params(calc)
+                remaining.discard(kind)
+                if not remaining:
+                    break
+
+    return params
+
 
 class MolThermDataProcessor:
     """
@@ -43,141 +428,354 @@ class MolThermDataProcessor:
         self.base_dir = base_dir
         self.reactant_pre = reactant_pre
         self.product_pre = product_pre
+        # Classifies reactant/product files as .mol files or QChem outputs
+        # (which are named like rct_0.out.opt_0, so ".out" is not a suffix)
+        self._cls_re = re.compile(
+            r"^(?P<kind>{}|{})(?P<body>.+?)(?:(?P<mol>\.mol)$|\.out)".format(
+                re.escape(reactant_pre), re.escape(product_pre)))
         self.db_file = db_file
 
+        # Directory listings (see _scan), keyed by absolute path, along with
+        # the modification time of the directory when it was listed
+        self._listings = {}
+        # Thermo fields of outputs, keyed by _file_key
+        self._thermo_fields = {}
+        # Species of QChem outputs (initial molecule) and .mol files, keyed by
+        # _file_key
+        self._species_keys = {}
+        # Reactant id -> reaction directories (see _get_reactant_index)
+        self._reactant_index = None
+        # Molecule descriptors, keyed by structure (see _descriptor_key)
+        self._descriptors = {}
+
+        # Collections whose index has been requested (see _collection)
+        self._indexed = set()
+
         try:
             self.db = QChemCalcDb.from_db_file(self.db_file)
         except:
             self.db = None
 
-    def check_appropriate_dirs(self, dirs):
+    def _collection(self, name):
         """
-        Returns only those reactions which have appropriate products and
-        reactants (products, reactants have same number of atoms).
+        Get a collection of self.db. The first time that a collection is
+        requested, make sure that it is indexed on the field it is queried by
+        (see INDEXED_FIELDS).
 
-        This is not a sophisticated checking mechanism, and could probably be
-        easily improved upon.
+        Indexes are created here rather than in __init__ so that processors
+        which never touch the database don't wait on the server. If the index
+        can't be created (for instance, for a read-only user), queries still
+        work, only more slowly.
+
+        :param name: Name of the collection ("molecules" or "thermo").
+        :return: pymongo Collection
+        """
+
+        collection = self.db.db[name]
+
+        if name not in self._indexed:
+            self._indexed.add(name)
+            field = INDEXED_FIELDS.get(name)
+            if field is not None:
+                try:
+                    collection.create_index(field, background=True)
+                except PyMongoError as e:
+                    logger.warning("Could not index %s on %s: %s", name,
+                                   field, e)
+
+        return collection
+
+    def clear_cache(self):
+        """
+        Forget all cached directory listings and parsed output files.
+
+        Listings and files that have changed since they were read are detected
+        by their modification time, so this is mostly useful to free memory.
+        The reactant index (see _get_reactant_index) is not checked, however,
+        and is only rebuilt after this is called.
 
         :return:
         """
 
-        add_up = []
+        self._listings = {}
+        self._thermo_fields = {}
+        self._species_keys = {}
+        self._reactant_index = None
+        self._descriptors = {}
 
-        for d in dirs:
-            path = join(self.base_dir, d)
-            files = [f for f in listdir(path) if isfile(join(path, f))]
-            rcts = [f for f in files if f.startswith(self.reactant_pre) and f.endswith(".mol")]
-            pros = [f for f in files if f.startswith(self.product_pre) and f.endswith(".mol")]
+    def _list_dir(self, path):
+        """
+        List a directory, reusing the listing if the same directory has
+        already been read by this processor and has not changed since (adding,
+        removing, or renaming files updates the directory's modification
+        time).
 
-            rct_mols = [get_molecule(join(self.base_dir, d, r)) for r in rcts]
-            pro_mols = [get_molecule(join(self.base_dir, d, p)) for p in pros]
+        :param path: Path to a directory.
+        :return: tuple (all_names, file_names), as from _scan.
+        """
 
-            total_pro_length = sum([len(p) for p in pro_mols])
-            total_rct_length = sum([len(r) for r in rct_mols])
+        path, mtime = _file_key(path)
 
-            if total_pro_length == total_rct_length:
-                add_up.append(d)
+        cached = self._listings.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, _scan(path))
+            self._listings[path] = cached
 
-        return add_up
+        return cached[1]
 
-    def extract_reaction_thermo_files(self, path):
+    def _reaction_dirs(self):
         """
-        Naively scrape thermo data from QChem output files.
+        List the reaction subdirectories of self.base_dir, using the file
+        type information from scandir rather than an isdir() per entry.
 
-        :param path: Path to a subdirectory.
+        :return: list of subdirectory names.
+        """
 
-        :return: dict {prop: value}, where properties are enthalpy, entropy.
+        with scandir(self.base_dir) as entries:
+            return [e.name for e in entries
+                    if e.is_dir() and not e.name.startswith("block")]
+
+    def _qcout_species(self, path):
         """
+        Get the species of the initial molecule in a QChem output, both in
+        their original order and sorted (so that they can be compared
+        directly against other molecules regardless of atom order).
 
-        base_path = join(self.base_dir, path)
+        :param path: Path to a QChem output file.
+        :return: tuple (species, sorted_species), each a tuple of str
+        """
 
-        rct_ids = [extract_id(f) for f in listdir(base_path) if
-                   f.endswith(".mol") and f.startswith(self.reactant_pre)]
+        key = _file_key(path)
 
-        pro_ids = [extract_id(f) for f in listdir(base_path) if
-                   f.endswith(".mol") and f.startswith(self.product_pre)]
+        if key not in self._species_keys:
+            species = _scrape_initial_species(key[0]) or ()
+            self._species_keys[key] = (species, tuple(sorted(species)))
 
-        rct_map = {m: [f for f in listdir(base_path) if
-                       f.startswith(self.reactant_pre) and m in f
-                       and ".out" in f and not f.endswith("_copy")]
-                   for m in rct_ids}
-        pro_map = {m: [f for f in listdir(base_path)
-                       if f.startswith(self.product_pre) and m in f
-                       and ".out" in f] for m in pro_ids}
+        return self._species_keys[key]
 
-        rct_thermo = {"enthalpy": 0, "entropy": 0, "energy": 0, "has_sp": {}}
-        pro_thermo = {"enthalpy": 0, "entropy": 0, "energy": 0, "has_sp": {}}
+    def _mol_species(self, path):
+        """
+        Get the species of the molecule in a .mol file (see get_molecule),
+        both in their original order and sorted, as for _qcout_species.
 
-        for mol in rct_map.keys():
-            enthalpy = 0
-            entropy = 0
-            energy_opt = 0
-            energy_sp = 0
+        :param path: Path to a .mol file.
+        :return: tuple (species, sorted_species), each a tuple of str
+        """
 
-            for out in rct_map[mol]:
-                qcout = QCOutput(join(base_path, out))
+        key = _file_key(path)
 
-                # Catch potential for Nonetype entries
-                if "freq" in out:
-                    enthalpy = qcout.data.get("enthalpy", 0) or 0
-                    entropy = qcout.data.get("entropy", 0) or 0
-                elif "opt" in out:
-                    energy_opt = qcout.data.get("final_energy", 0) or 0
-                elif "sp" in out:
-                    energy_sp = qcout.data.get("final_energy_sp", 0) or 0
+        if key not in self._species_keys:
+            species = tuple(str(sp) for sp in get_molecule(key[0]).species)
+            self._species_keys[key] = (species, tuple(sorted(species)))
 
-            if energy_sp == 0:
-                rct_thermo["energy"] += energy_opt
-                rct_thermo["has_sp"][self.reactant_pre + str(mol)] = False
+        return self._species_keys[key]
+
+    def _get_thermo_fields(self, paths):
+        """
+        Collect the thermo fields (see THERMO_FIELDS) of several QChem output
+        files, scraping only those that have not been read yet (or have
+        changed since).
+
+        Files are scraped one after another: each is only scanned once for a
+        few patterns, which is much cheaper than starting worker processes to
+        share the work.
+
+        :param paths: List of paths to QChem output files.
+        :return: dict {path: dict {field: value}}
+        """
+
+        fields = {}
+
+        for path in paths:
+            key = _file_key(path)
+            if key not in self._thermo_fields:
+                self._thermo_fields[key] = _scrape_fields(key[0])
+            fields[path] = self._thermo_fields[key]
+
+        return fields
+
+    def _classify_dirs(self, dirs, molecules=True):
+        """
+        Sort the reactant and product .mol files of each subdirectory, listing
+        every subdirectory only once.
+
+        :param dirs: List of subdirectories of self.base_dir.
+        :param molecules: If True (default), also parse each .mol file into a
+            Molecule. This is relatively expensive, and can be skipped when
+            only filenames are needed.
+        :return: dict {dir: {"rct_files": list, "pro_files": list,
+            "rct_mols": list, "pro_mols": list}}. If molecules is False,
+            "rct_mols" and "pro_mols" will be empty.
+        """
+
+        classified = {}
+
+        base_dir = self.base_dir
+        rct_pre = self.reactant_pre
+        pro_pre = self.product_pre
+        cls_match = self._cls_re.match
+
+        for d in dirs:
+            path = join(base_dir, d)
+            _, files = self._list_dir(path)
+
+            # Sort .mol files by prefix in a single pass
+            mol_files = {rct_pre: [], pro_pre: []}
+            for match in filter(None, map(cls_match, files)):
+                if match.group("mol") is not None:
+                    mol_files[match.group("kind")].append(match.string)
+            rcts = mol_files[rct_pre]
+            pros = mol_files[pro_pre]
+
+            if molecules:
+                rct_mols = [get_molecule(join(path, r)) for r in rcts]
+                pro_mols = [get_molecule(join(path, p)) for p in pros]
             else:
-                rct_thermo["energy"] += energy_sp
-                rct_thermo["has_sp"][self.reactant_pre + str(mol)] = True
+                rct_mols = []
+                pro_mols = []
+
+            classified[d] = {"rct_files": rcts,
+                             "pro_files": pros,
+                             "rct_mols": rct_mols,
+                             "pro_mols": pro_mols}
+
+        return classified
 
-            rct_thermo["enthalpy"] += enthalpy
-            rct_thermo["entropy"] += entropy
-            print(path, mol, enthalpy, energy_sp)
+    def check_appropriate_dirs(self, dirs):
+        """
+        Returns only those reactions which have appropriate products and
+        reactants (products, reactants have same number of atoms).
 
-        for mol in pro_map.keys():
+        This is not a sophisticated checking mechanism, and could probably be
+        easily improved upon.
+
+        :return:
+        """
+
+        classified = self._classify_dirs(dirs)
+
+        return [d for d, info in classified.items()
+                if sum(len(p) for p in info["pro_mols"]) ==
+                sum(len(r) for r in info["rct_mols"])]
+
+    def _accumulate_thermo(self, mol_map, prefix, base_path, fields):
+        """
+        Sum the thermo data of a set of molecules (either all reactants or
+        all products of a reaction) from their QChem output files.
+
+        :param mol_map: dict {mol_id: list of output filenames}
+        :param prefix: Prefix of the molecules' files (self.reactant_pre or
+            self.product_pre).
+        :param base_path: Directory containing the output files.
+        :param fields: dict {path: dict of thermo fields}, as returned by
+            _get_thermo_fields.
+        :return: dict {"enthalpy": float, "entropy": float, "energy": float,
+            "has_sp": dict}
+        """
+
+        totals = {"enthalpy": 0, "entropy": 0, "energy": 0, "has_sp": {}}
+
+        for mol, outs in mol_map.items():
             enthalpy = 0
             entropy = 0
             energy_opt = 0
             energy_sp = 0
 
-            for out in pro_map[mol]:
-                qcout = QCOutput(join(base_path, out))
+            for out in outs:
+                data = fields[join(base_path, out)]
 
+                kind = _output_kind(out)
                 # Catch potential for Nonetype entries
-                if "freq" in out:
-                    enthalpy = qcout.data.get("enthalpy", 0) or 0
-                    entropy = qcout.data.get("entropy", 0) or 0
-                elif "opt" in out:
-                    energy_opt = qcout.data.get("final_energy", 0) or 0
-                elif "sp" in out:
-                    energy_sp = qcout.data.get("final_energy_sp", 0) or 0
+                if kind == "freq":
+                    enthalpy = data.get("enthalpy", 0) or 0
+                    entropy = data.get("entropy", 0) or 0
+                elif kind == "opt":
+                    energy_opt = data.get("final_energy", 0) or 0
+                elif kind == "sp":
+                    energy_sp = data.get("final_energy_sp", 0) or 0
 
             # Enthalpy calculation should actually be enthalpy - energy_sp
             # But currently, not all calculations have sp
-            if int(energy_sp) == 0:
-                pro_thermo["energy"] += energy_opt
-                pro_thermo["has_sp"][self.product_pre + str(mol)] = False
+            if energy_sp == 0:
+                totals["energy"] += energy_opt
+                totals["has_sp"][prefix + str(mol)] = False
             else:
-                pro_thermo["energy"] += energy_sp
-                pro_thermo["has_sp"][self.product_pre + str(mol)] = True
+                totals["energy"] += energy_sp
+                totals["has_sp"][prefix + str(mol)] = True
+
+            totals["enthalpy"] += enthalpy
+            totals["entropy"] += entropy
+            logger.debug("%s %s: enthalpy %s, sp energy %s", base_path, mol,
+                         enthalpy, energy_sp)
 
-            pro_thermo["enthalpy"] += enthalpy
-            pro_thermo["entropy"] += entropy
-            print(path, mol, enthalpy, energy_sp)
+        return totals
+
+    def extract_reaction_thermo_files(self, path):
+        """
+        Naively scrape thermo data from QChem output files.
+
+        :param path: Path to a subdirectory.
+
+        :return: dict {prop: value}, where properties are enthalpy, entropy.
+        """
+
+        base_path = join(self.base_dir, path)
+        names, _ = self._list_dir(base_path)
+
+        # Sort reactant/product .mol files and outputs in a single pass
+        rct_ids = []
+        pro_ids = []
+        out_files = []
+        for f in names:
+            match = self._cls_re.match(f)
+            if match is None:
+                continue
+            f_id = extract_id(match.group("body"))
+            is_rct = match.group("kind") == self.reactant_pre
+            if match.group("mol") is not None:
+                (rct_ids if is_rct else pro_ids).append(f_id)
+            elif not (is_rct and f.endswith("_copy")):
+                out_files.append((is_rct, f_id, f))
+
+        # Bucket outputs by molecule
+        rct_map = {m: [] for m in rct_ids}
+        pro_map = {m: [] for m in pro_ids}
+
+        for is_rct, f_id, f in out_files:
+            mol_map = rct_map if is_rct else pro_map
+
+            # Outputs are usually named after their .mol file
+            # (rct_<id>.out.opt_0), so the id can be read off directly
+            if f_id in mol_map:
+                mol_map[f_id].append(f)
+            else:
+                for m, outs in mol_map.items():
+                    if m in f:
+                        outs.append(f)
+
+        fields = self._get_thermo_fields(
+            [join(base_path, out) for outs in rct_map.values() for out in outs] +
+            [join(base_path, out) for outs in pro_map.values() for out in outs])
+
+        rct_thermo = self._accumulate_thermo(rct_map, self.reactant_pre,
+                                             base_path, fields)
+        pro_thermo = self._accumulate_thermo(pro_map, self.product_pre,
+                                             base_path, fields)
 
         thermo_data = {}
 
         # Generate totals as ∆H = H_pro - H_rct, ∆S = S_pro - S_rct
         # Also ensures that units are appropriate (Joules/mol,
         # rather than cal/mol or kcal/mol, or hartree for energy)
-        energy = (pro_thermo["energy"] - rct_thermo["energy"]) * 627.509
-        enthalpy = (pro_thermo["enthalpy"] - rct_thermo["enthalpy"])
-        print(path, energy, enthalpy)
-        thermo_data["enthalpy"] = (energy + enthalpy) * 1000 * 4.184
-        thermo_data["entropy"] = (pro_thermo["entropy"] - rct_thermo["entropy"]) * 4.184
+        enthalpy, entropy = _combine_thermo(
+            [pro_thermo["energy"], pro_thermo["enthalpy"], pro_thermo["entropy"]],
+            [rct_thermo["energy"], rct_thermo["enthalpy"], rct_thermo["entropy"]])
+        # Python floats, so that t_critical below still raises
+        # ZeroDivisionError instead of returning inf
+        thermo_data["enthalpy"] = float(enthalpy)
+        thermo_data["entropy"] = float(entropy)
+        logger.debug("%s: enthalpy %s, entropy %s", path,
+                     thermo_data["enthalpy"], thermo_data["entropy"])
         try:
             thermo_data["t_critical"] = thermo_data["enthalpy"] / thermo_data["entropy"]
         except ZeroDivisionError:
@@ -226,12 +824,11 @@ class MolThermDataProcessor:
             energy_sp = None
 
             for calc in job["calcs_reversed"]:
-                if (calc["task"]["type"] == "freq"
-                        or calc["task"]["type"] == "frequency")\
-                        and (enthalpy is None or entropy is None):
+                kind = TASK_KINDS.get(calc["task"]["type"])
+                if kind == "freq" and (enthalpy is None or entropy is None):
                     enthalpy = calc["enthalpy"]
                     entropy = calc["entropy"]
-                if calc["task"]["type"] == "sp" and energy_sp is None:
+                elif kind == "sp" and energy_sp is None:
                     energy_sp = calc["final_energy_sp"]
 
             if enthalpy is None:
@@ -245,101 +842,44 @@ class MolThermDataProcessor:
                     "entropy": entropy,
                     "energy": energy_sp}
 
-        if abspath(directory) != directory:
+        if not isabs(directory):
             directory = join(self.base_dir, directory)
 
-        mol_files = [f for f in listdir(directory) if f.endswith(".mol")]
+        mol_files = [f for f in self._list_dir(directory)[0]
+                     if f.endswith(".mol")]
 
         dir_ids = [extract_id(f) for f in mol_files]
 
-        collection = self.db.db["molecules"]
-        records = []
+        collection = self._collection("molecules")
+
+        # Fetch all molecules with a single query, rather than one query per
+        # molecule. If an id appears more than once, keep the first record.
+        pending = set(dir_ids)
+        by_id = {}
+        for record in collection.find({"mol_id": {"$in": list(pending)}},
+                                      THERMO_DB_PROJECTION):
+            if record["mol_id"] in pending:
+                by_id[record["mol_id"]] = record
+                pending.discard(record["mol_id"])
+                if not pending:
+                    break
 
-        for mol_id in dir_ids:
-            record = collection.find_one({"mol_id": str(mol_id)})
-            records.append(record)
+        records = [by_id.get(mol_id) for mol_id in dir_ids]
 
         # Sort files for if they are reactants or products
         reactants = []
         products = []
-        for i, record in enumerate(records):
-            filename = mol_files[i]
-            if opt is None:
-                for calc in record["calcs_reversed"]:
-                    if calc["task"]["type"] == "opt" or \
-                            calc["task"]["type"] == "optimization":
-                        method = calc["input"]["rem"]["method"]
-                        basis = calc["input"]["rem"]["basis"]
-                        solvent_method = calc["input"]["rem"].get(
-                            "solvent_method", None)
-                        if solvent_method == "smd":
-                            if calc["input"]["smx"] is None:
-                                solvent = None
-                            else:
-                                solvent = calc["input"]["smx"]["solvent"]
-                        elif solvent_method == "pcm":
-                            solvent = calc["input"]["solvent"]
-                        else:
-                            solvent = None
 
-                        opt = {"method": method,
-                               "basis": basis,
-                               "solvent_method": solvent_method,
-                               "solvent": solvent}
-                        break
-            if freq is None:
-                for calc in record["calcs_reversed"]:
-                    if calc["task"]["type"] == "freq" or \
-                            calc["task"]["type"] == "frequency":
-                        method = calc["input"]["rem"]["method"]
-                        basis = calc["input"]["rem"]["basis"]
-                        solvent_method = calc["input"]["rem"].get(
-                            "solvent_method", None)
-                        if solvent_method == "smd":
-                            if calc["input"]["smx"] is None:
-                                solvent = None
-                            else:
-                                solvent = calc["input"]["smx"]["solvent"]
-                        elif solvent_method == "pcm":
-                            solvent = calc["input"]["solvent"]
-                        else:
-                            solvent = None
-
-                        freq = {"method": method,
-                                "basis": basis,
-                                "solvent_method": solvent_method,
-                                "solvent": solvent}
-                        break
-            if sp is None:
-                for calc in record["calcs_reversed"]:
-                    if calc["task"]["type"] == "sp":
-                        method = calc["input"]["rem"]["method"]
-                        basis = calc["input"]["rem"]["basis"]
-                        solvent_method = calc["input"]["rem"].get(
-                            "solvent_method", None)
-                        if solvent_method == "smd":
-                            if calc["input"]["smx"] is None:
-                                solvent = None
-                            else:
-                                solvent = calc["input"]["smx"]["solvent"]
-                        elif solvent_method == "pcm":
-                            solvent = calc["input"]["solvent"]
-                        else:
-                            solvent = None
-
-                        sp = {"method": method,
-                              "basis": basis,
-                              "solvent_method": solvent_method,
-                              "solvent": solvent}
-                        break
+        params = _find_job_params(records, {"opt": opt, "freq": freq, "sp": sp})
 
+        for filename, record in zip(mol_files, records):
             if filename.startswith(self.reactant_pre):
                 reactants.append(record)
             elif filename.startswith(self.product_pre):
                 products.append(record)
             else:
-                print("Skipping {} because it cannot be determined if it is"
-                      "reactant or product.".format(filename))
+                logger.warning("Skipping %s because it cannot be determined if "
+                               "it is reactant or product.", filename)
                 continue
 
         # Get ids
@@ -351,12 +891,19 @@ class MolThermDataProcessor:
         pro_thermo = [get_thermo(p) for p in products]
 
         # Compile reaction thermo from reactant and product thermos
-        delta_e = sum(p["energy"] for p in pro_thermo) - sum(r["energy"] for r in rct_thermo)
-        delta_e *= 627.509
-        delta_h = sum(p["enthalpy"] for p in pro_thermo) - sum(r["enthalpy"] for r in rct_thermo) + delta_e
-        delta_h *= 1000 * 4.184
-        delta_s = sum(p["entropy"] for p in pro_thermo) - sum(r["entropy"] for r in rct_thermo)
-        delta_s *= 4.184
+        # Columns are (energy, enthalpy, entropy); reshape so that reactions
+        # with no reactants or products still give a (0, 3) array
+        rct_arr = np.array([(t["energy"], t["enthalpy"], t["entropy"])
+                            for t in rct_thermo], dtype=float).reshape(-1, 3)
+        pro_arr = np.array([(t["energy"], t["enthalpy"], t["entropy"])
+                            for t in pro_thermo], dtype=float).reshape(-1, 3)
+
+        delta_h, delta_s = _combine_thermo(pro_arr.sum(axis=0),
+                                           rct_arr.sum(axis=0))
+        # Convert back to Python floats, so that t_star below still raises
+        # ZeroDivisionError instead of returning inf
+        delta_h = float(delta_h)
+        delta_s = float(delta_s)
         thermo = {
             "enthalpy": delta_h,
             "entropy": delta_s
@@ -368,9 +915,9 @@ class MolThermDataProcessor:
             thermo["t_star"] = 0
 
         result = {"dir_name": directory,
-                  "opt": opt,
-                  "freq": freq,
-                  "sp": sp,
+                  "opt": params["opt"],
+                  "freq": params["freq"],
+                  "sp": params["sp"],
                   "reactant_ids": reactant_ids,
                   "product_ids": product_ids,
                   "thermo": thermo}
@@ -407,10 +954,12 @@ class MolThermDataProcessor:
             raise RuntimeError("Cannot record data to db without valid database"
                                " connection!")
 
-        collection = self.db.db["molecules"]
+        collection = self._collection("molecules")
 
         collection.insert_one(task_doc)
 
+        self._reactant_index = None
+
     def record_reaction_data_db(self, directory, use_files=True, use_db=False,
                                 opt=None, freq=None, sp=None):
         """
@@ -440,7 +989,7 @@ class MolThermDataProcessor:
             raise RuntimeError("Could not connect to database. Check db_file"
                                "and try again later.")
 
-        collection = self.db.db["thermo"]
+        collection = self._collection("thermo")
 
         if use_db:
             collection.insert_one(self.extract_reaction_thermo_db(directory,
@@ -483,7 +1032,7 @@ class MolThermDataProcessor:
         :return:
         """
 
-        if abspath(directory) != directory:
+        if not isabs(directory):
             directory = join(self.base_dir, directory)
 
         with open(join(directory, filename), "w+") as file:
@@ -496,13 +1045,15 @@ class MolThermDataProcessor:
                 raise RuntimeError("Either database or files must be used to "
                                    "extract thermo data.")
 
-            file.write("Directory: {}\n".format(data["dir_name"]))
-            file.write("Optimization Input: {}\n".format(data.get("opt", "")))
-            file.write("Frequency Input: {}\n".format(data.get("freq", "")))
-            file.write("Single-Point Input: {}\n".format(data.get("sp", "")))
-            file.write("Reaction Enthalpy: {}\n".format(data["thermo"]["enthalpy"]))
-            file.write("Reaction Entropy: {}\n".format(data["thermo"]["entropy"]))
-            file.write("Turning Temperature: {}\n".format(data["thermo"]["t_critical"]))
+            lines = ["Directory: {}".format(data["dir_name"]),
+                     "Optimization Input: {}".format(data.get("opt", "")),
+                     "Frequency Input: {}".format(data.get("freq", "")),
+                     "Single-Point Input: {}".format(data.get("sp", "")),
+                     "Reaction Enthalpy: {}".format(data["thermo"]["enthalpy"]),
+                     "Reaction Entropy: {}".format(data["thermo"]["entropy"]),
+                     "Turning Temperature: {}".format(data["thermo"]["t_critical"])]
+
+            file.write("\n".join(lines) + "\n")
 
     def populate_collections(self, thermo=False, overwrite=False):
         """
@@ -520,7 +1071,7 @@ class MolThermDataProcessor:
             raise RuntimeError("Cannot connect to database. Check configuration"
                                " file and try again.")
 
-        mol_coll = self.db.db["molecules"]
+        mol_coll = self._collection("molecules")
         completed_mols = self.get_completed_molecules(extra=True)
         mols_in_db = [mol for mol in mol_coll.find()]
 
@@ -544,7 +1095,7 @@ class MolThermDataProcessor:
                                     {"$set": task_doc})
 
         if thermo:
-            thermo_coll = self.db.db["thermo"]
+            thermo_coll = self._collection("thermo")
             completed_rxns = self.get_completed_reactions()
             rxns_in_db = [rxn for rxn in thermo_coll.find()]
 
@@ -573,19 +1124,18 @@ class MolThermDataProcessor:
             raise RuntimeError("Cannot access database. Check configuration"
                                " settings and try again.")
 
-        dirs = [d for d in listdir(self.base_dir) if
-                isdir(join(self.base_dir, d)) and not d.startswith("block")]
+        dirs = self._reaction_dirs()
 
         drone = MolThermDrone()
-        mol_coll = self.db.db["molecules"]
+        mol_coll = self._collection("molecules")
 
         if thermo:
-            thermo_coll = self.db.db["thermo"]
+            thermo_coll = self._collection("thermo")
 
         for d in dirs:
             calc_dir = join(self.base_dir, d)
 
-            files = [f for f in listdir(calc_dir) if isfile(join(calc_dir, f))]
+            _, files = self._list_dir(calc_dir)
 
             mol_names = set()
 
@@ -623,6 +1173,32 @@ class MolThermDataProcessor:
                 thermo_coll.update_one({"dir_name": calc_dir},
                                        {"$set": {"thermo": new_thermo}})
 
+    def _enumerate_all_dirs(self, dirs):
+        """
+        (Re-)list many subdirectories at once. Directory reads are issued
+        concurrently, which helps considerably when the filesystem cache is
+        cold or the filesystem is networked.
+
+        Results are stored in the listing cache, keyed by absolute path (see
+        _list_dir).
+
+        :param dirs: List of subdirectories of self.base_dir.
+        :return: dict {path: (all_names, file_names)}
+        """
+
+        paths = [abspath(join(self.base_dir, d)) for d in dirs]
+
+        # The modification time is read before listing, so that changes made
+        # during the listing are picked up next time
+        with ThreadPoolExecutor() as executor:
+            listings = executor.map(
+                lambda path: (stat(path).st_mtime_ns, _scan(path)), paths)
+
+            for path, listing in zip(paths, listings):
+                self._listings[path] = listing
+
+        return {path: self._listings[path][1] for path in paths}
+
     def copy_outputs_across_directories(self):
         """
         Copy output files between subdirectories to ensure that all reaction
@@ -637,61 +1213,110 @@ class MolThermDataProcessor:
 
         files_copied = 0
 
-        dirs = [d for d in listdir(self.base_dir) if
-                isdir(join(self.base_dir, d)) and not d.startswith("block")]
-        print("Number of directories: {}".format(len(dirs)))
+        dirs = self._reaction_dirs()
+        logger.info("Number of directories: %d", len(dirs))
+
+        contents = self._enumerate_all_dirs(dirs)
+        # Build each directory path once, rather than in every inner loop
+        dir_paths = {d: abspath(join(self.base_dir, d)) for d in dirs}
+
+        # Index every directory once, so that each molecule can be looked up
+        # directly instead of rescanning all other directories:
+        # - the (sorted) species of the outputs present in each directory
+        # - which directories hold a .mol file with a given id, and as what
+        # - the reactant and product outputs of each directory
+        rct_pre = self.reactant_pre
+        pro_pre = self.product_pre
+        cls_match = self._cls_re.match
+        species_of = self._qcout_species
+
+        dir_keys = {}
+        id_index = defaultdict(list)
+        dir_outs = {}
+        for d in dirs:
+            path = dir_paths[d]
+            keys = set()
+            outs = {rct_pre: [], pro_pre: []}
+            for f in contents[path][1]:
+                if ".out" in f:
+                    keys.add(species_of(join(path, f))[1])
+                match = cls_match(f)
+                if match is None:
+                    continue
+                if match.group("mol") is None:
+                    outs[match.group("kind")].append(f)
+                else:
+                    id_index[extract_id(match.group("body"))].append(
+                        (d, match.group("kind")))
+            dir_keys[d] = keys
+            dir_outs[d] = outs
 
         for start_d in dirs:
-            start_p = join(self.base_dir, start_d)
-            mol_files = [f for f in listdir(start_p) if isfile(join(start_p, f)) and f.endswith(".mol")]
-            out_files = [f for f in listdir(start_p) if isfile(join(start_p, f)) and ".out" in f]
+            start_p = dir_paths[start_d]
+            mol_files = [f for f in contents[start_p][1] if f.endswith(".mol")]
 
             for mf in mol_files:
-                is_covered = False
-                mol_id = extract_id(mf)
-
-                mol_obj = get_molecule(join(start_p, mf))
-
-                for out in out_files:
-                    qcout = QCOutput(join(start_p, out))
-                    if sorted(qcout.data["initial_molecule"].species) == sorted(mol_obj.species):
-                        # If there is already output, do not copy any files
-                        is_covered = True
+                mol_species, mol_key = self._mol_species(join(start_p, mf))
 
-                if is_covered:
+                # If there is already output, do not copy any files
+                if mol_key in dir_keys[start_d]:
                     continue
 
-                for other_d in dirs:
+                for other_d, other_kind in id_index[extract_id(mf)]:
                     if other_d == start_d:
                         continue
-                    if is_covered:
-                        break
 
-                    other_p = join(self.base_dir, other_d)
-                    # Check if this id is present
-                    other_mol_files = [f for f in listdir(other_p) if isfile(join(other_p, f)) and f.endswith(".mol") and mol_id in f]
-                    other_out_files = [f for f in listdir(other_p) if isfile(join(other_p, f)) and ".out" in f]
-                    to_copy = []
-                    for other_mol in other_mol_files:
-                        if other_mol.startswith(self.product_pre):
-                            to_copy = [f for f in other_out_files if
-                                       f.startswith(self.product_pre)]
-                        elif other_mol.startswith(self.reactant_pre):
-                            to_check = [f for f in other_out_files if f.startswith(self.reactant_pre)]
-                            to_copy = []
-                            for file in to_check:
-                                qcout = QCOutput(join(other_p, file))
-                                if qcout.data["initial_molecule"].species == mol_obj.species:
-                                    to_copy.append(file)
-                        else:
-                            to_copy = []
+                    other_p = dir_paths[other_d]
+
+                    if other_kind == pro_pre:
+                        to_copy = dir_outs[other_d][pro_pre]
+                    else:
+                        to_copy = [f for f in dir_outs[other_d][rct_pre] if
+                                   species_of(join(other_p, f))[0] == mol_species]
+
                     for file in to_copy:
                         shutil.copyfile(join(other_p, file), join(start_p, file + "_copy"))
+                        # Keep the cached listing and index up to date
+                        for listing in contents[start_p]:
+                            listing.append(file + "_copy")
+                        dir_keys[start_d].add(
+                            species_of(join(other_p, file))[1])
                         files_copied += 1
 
-                    if files_copied > 0:
-                        is_covered = True
-        print("Number of files copied: {}".format(files_copied))
+                    if to_copy:
+                        break
+
+        self._reactant_index = None
+        logger.info("Number of files copied: %d", files_copied)
+
+    def _get_reactant_index(self):
+        """
+        Map each reactant id to the reaction directories which contain it.
+        The index is built from a single sweep over all subdirectories, and
+        reused until the cache is cleared.
+
+        :return: dict {rct_id: list of directories}
+        """
+
+        if self._reactant_index is None:
+            index = {}
+            dirs = self._reaction_dirs()
+            # List all directories concurrently up front
+            self._enumerate_all_dirs(dirs)
+
+            classified = self._classify_dirs(dirs, molecules=False)
+
+            for d, info in classified.items():
+                for file in info["rct_files"]:
+                    f_id = extract_id(file)
+                    if f_id in index:
+                        index[f_id].append(d)
+                    else:
+                        index[f_id] = [d]
+
+            self._reactant_index = index
+
+        return self._reactant_index
 
     def find_common_reactants(self, rct_id):
         """
@@ -702,13 +1327,8 @@ class MolThermDataProcessor:
             molecules.
         :return: List of reaction directories containing the given reactant.
         """
-        results = []
-        for d in listdir(self.base_dir):
-            if isdir(join(self.base_dir, d)) and not d.startswith("block"):
-                for f in listdir(join(self.base_dir, d)):
-                    if rct_id in f:
-                        results.append(d)
-        return results
+
+        return list(self._get_reactant_index().get(rct_id, []))
 
     def map_reactants_to_reactions(self):
         """
@@ -721,23 +1341,9 @@ class MolThermDataProcessor:
         :return:
         """
 
-        mapping = {}
-        dirs = [d for d in listdir(self.base_dir)
-                if isdir(join(self.base_dir, d)) and not d.startswith("block")]
-
-        for d in dirs:
-            if isdir(join(self.base_dir, d)) and not d.startswith("block"):
-                molfiles = [f for f in listdir(join(self.base_dir, d))
-                            if f.endswith(".mol")
-                            and f.startswith(self.reactant_pre)]
-                for file in molfiles:
-                    f_id = extract_id(file)
-                    if f_id in mapping:
-                        mapping[f_id].append(d)
-                    else:
-                        mapping[f_id] = [d]
-
-        return mapping
+        # Copy, so that the cached index can't be modified by the caller
+        return {rct_id: list(dirs) for rct_id, dirs
+                in self._get_reactant_index().items()}
 
     def get_completed_molecules(self, dirs=None, extra=False):
         """
@@ -752,31 +1358,47 @@ class MolThermDataProcessor:
 
         completed = set()
 
-        all_dirs = [d for d in listdir(self.base_dir)
-                    if isdir(join(self.base_dir, d)) and not d.startswith("block")]
+        all_dirs = self._reaction_dirs()
 
         if dirs is not None:
             all_dirs = [d for d in all_dirs if d in dirs]
 
         for d in all_dirs:
-            path = join(self.base_dir, d)
-            mapping = associate_qchem_to_mol(self.base_dir, d)
+            completed.update(self._completed_in_dir(d, extra))
 
-            for molfile, qcfiles in mapping.items():
-                mol_id = extract_id(molfile)
+        return completed
 
-                for outfile in qcfiles["out"]:
-                    if "sp" in outfile:
-                        spfile = QCOutput(join(path, outfile))
+    def _completed_in_dir(self, directory, extra=False):
+        """
+        Find the molecules in a single subdirectory that have a completed sp
+        output file.
+
+        :param directory: Subdirectory of self.base_dir.
+        :param extra: If True, include directory of completed reaction and
+            name of molfile along with mol_id
+        :return: set of completed molecules
+        """
 
-                        completion = spfile.data.get("completion", False)
+        completed = set()
 
-                        # Currently will catch iefpcm or smd
-                        if completion:
-                            if extra:
-                                completed.add((mol_id, d, molfile))
-                            else:
-                                completed.add(mol_id)
+        path = join(self.base_dir, directory)
+        # Only the species of each output are needed for matching, so they
+        # are scraped rather than parsing every output in full
+        mapping = associate_qchem_to_mol(
+            self.base_dir, directory,
+            out_species=lambda p: list(self._qcout_species(p)[0]))
+
+        for molfile, qcfiles in mapping.items():
+            mol_id = extract_id(molfile)
+
+            for outfile in qcfiles["out"]:
+                if "sp" in outfile:
+                    # Currently will catch iefpcm or smd
+                    if _scrape_completion(join(path, outfile)):
+                        if extra:
+                            completed.add((mol_id, directory, molfile))
+                        else:
+                            completed.add(mol_id)
 
         return completed
 
@@ -792,26 +1414,65 @@ class MolThermDataProcessor:
             raise RuntimeError("Could not connect to database. Check db_file"
                                "and try again later.")
 
-        collection = self.db.db["molecules"]
+        collection = self._collection("molecules")
 
-        completed_molecules = [x["mol_id"] for x in collection.find()]
+        # Only the ids are needed; a set makes each membership test O(1)
+        try:
+            completed_molecules = set(collection.distinct("mol_id"))
+        except OperationFailure:
+            # The result of distinct is limited to a single BSON document
+            completed_molecules = {x["mol_id"] for x in
+                                   collection.find({}, {"mol_id": 1, "_id": 0})}
 
         completed_reactions = set()
 
-        dirs = [d for d in listdir(self.base_dir) if isdir(join(self.base_dir, d)) and not d.startswith("block")]
+        dirs = self._reaction_dirs()
+        # List all directories concurrently up front
+        self._enumerate_all_dirs(dirs)
 
         for d in dirs:
             path = join(self.base_dir, d)
 
-            mols = [extract_id(f) for f in listdir(path) if isfile(join(path, f)) and f.endswith(".mol")]
+            mols = {extract_id(f) for f in self._list_dir(path)[1] if f.endswith(".mol")}
 
-            are_completed = [True if m in completed_molecules else False for m in mols]
-
-            if all(are_completed):
+            if mols.issubset(completed_molecules):
                 completed_reactions.add(d)
 
         return completed_reactions
 
+    def _get_descriptors(self, molecules):
+        """
+        Compute the descriptors (see _molecule_descriptors) of several
+        molecules, reusing those of structures that have already been seen.
+        Large batches of new structures are handled in parallel, since each is
+        independent.
+
+        :param molecules: List of Molecules.
+        :return: list of dicts {descriptor: value}, in the same order as
+            molecules.
+        """
+
+        keys = [_descriptor_key(m) for m in molecules]
+
+        to_compute = {}
+        for key, mol in zip(keys, molecules):
+            if key not in self._descriptors and key not in to_compute:
+                to_compute[key] = mol
+
+        # Starting a pool is only worth it for many molecules
+        if len(to_compute) < MIN_PARALLEL_DESCRIPTORS:
+            for key, mol in to_compute.items():
+                self._descriptors[key] = _molecule_descriptors(mol)
+        else:
+            workers = min(len(to_compute), cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_molecule_descriptors,
+                                       list(to_compute.values()))
+                for key, data in zip(list(to_compute.keys()), results):
+                    self._descriptors[key] = data
+
+        return [self._descriptors[key] for key in keys]
+
     def get_molecule_data(self, mol_id):
         """
         Compile all useful molecular data for analysis, including molecule size
@@ -825,60 +1486,86 @@ class MolThermDataProcessor:
         :return: dict of relevant molecule data.
         """
 
-        mol_data = {"mol_id": mol_id}
+        return self.get_molecule_data_batch([mol_id])[0]
+
+    def get_molecule_data_batch(self, mol_ids):
+        """
+        Compile molecular data (see get_molecule_data) for several molecules
+        at once. All molecules are fetched with a single query.
+
+        :param mol_ids: List of unique IDs associated with the molecules.
+        :return: list of dicts of relevant molecule data, in the same order as
+            mol_ids.
+        """
+
+        return self._add_descriptors(self._fetch_molecule_data(mol_ids))
+
+    def _fetch_molecule_data(self, mol_ids):
+        """
+        Query the thermo and optimized structure of several molecules (the
+        first part of get_molecule_data_batch).
+
+        :param mol_ids: List of unique IDs associated with the molecules.
+        :return: list of dicts, in the same order as mol_ids.
+        """
 
         if self.db is None:
             raise RuntimeError("Cannot query database; connection is invalid."
                                " Try to connect again.")
 
-        collection = self.db.db["molecules"]
+        collection = self._collection("molecules")
+
+        # If an id appears more than once, keep the first record
+        pending = set(mol_ids)
+        by_id = {}
+        for record in collection.find({"mol_id": {"$in": list(pending)}},
+                                      MOLECULE_DATA_PROJECTION):
+            if record["mol_id"] in pending:
+                by_id[record["mol_id"]] = record
+                pending.discard(record["mol_id"])
+                if not pending:
+                    break
 
-        mol_entry = collection.find_one({"mol_id": mol_id})
+        all_data = []
 
-        for calc in mol_entry["calcs_reversed"]:
-            if calc["task"]["name"] in ["freq", "frequency"]:
-                mol_data["enthalpy"] = calc["enthalpy"] * 4.184 * 1000
-                mol_data["entropy"] = calc["entropy"] * 4.184
-            if calc["task"]["name"] == "sp":
-                mol_data["energy"] = calc["final_energy_sp"] * 627.509 * 4.184 * 1000
-            if calc["task"]["name"] in ["opt", "optimization"]:
-                mol_dict = calc["molecule_from_optimized_geometry"]
-                mol_data["molecule"] = Molecule.from_dict(mol_dict)
+        for mol_id in mol_ids:
+            mol_data = {"mol_id": mol_id}
 
+            for calc in by_id[mol_id]["calcs_reversed"]:
+                if calc["task"]["name"] in ["freq", "frequency"]:
+                    mol_data["enthalpy"] = calc["enthalpy"] * 4.184 * 1000
+                    mol_data["entropy"] = calc["entropy"] * 4.184
+                if calc["task"]["name"] == "sp":
+                    mol_data["energy"] = calc["final_energy_sp"] * 627.509 * 4.184 * 1000
+                if calc["task"]["name"] in ["opt", "optimization"]:
+                    mol_dict = calc["molecule_from_optimized_geometry"]
+                    mol_data["molecule"] = Molecule.from_dict(mol_dict)
 
-        adaptor = BabelMolAdaptor(mol_data["molecule"])
-        pbmol = adaptor.pybel_mol
+            all_data.append(mol_data)
 
-        mol_data["number_atoms"] = len(mol_data["molecule"])
-        mol_data["molecular_weight"] = pbmol.molwt
-        mol_data["tpsa"] = pbmol.calcdesc()["TPSA"]
+        return all_data
 
-        extractor = FunctionalGroupExtractor(mol_data["molecule"])
-        molgraph = extractor.molgraph
-        func_grps = extractor.get_all_functional_groups()
+    def _add_descriptors(self, all_data):
+        """
+        Add structural descriptors (see _molecule_descriptors), the number of
+        atoms, and species counts to molecule data from _fetch_molecule_data.
 
-        mol_data["functional_groups"] = extractor.categorize_functional_groups(func_grps)
+        :param all_data: list of dicts, each with a "molecule". These are
+            updated in place.
+        :return: all_data
+        """
 
-        weights = nx.get_edge_attributes(molgraph.graph, "weight")
-        bonds_checked = set()
-        double_bonds = 0
-        triple_bonds = 0
-        for bond, weight in weights.items():
-            # Remove index from multidigraph
-            bond = (bond[0], bond[1])
-            if int(weight) == 2 and bond not in bonds_checked:
-                double_bonds += 1
-            elif int(weight) == 3 and bond not in bonds_checked:
-                triple_bonds += 1
-            bonds_checked.add(bond)
+        descriptors = self._get_descriptors([d["molecule"] for d in all_data])
 
-        mol_data["double_bonds"] = double_bonds
-        mol_data["triple_bonds"] = triple_bonds
+        for mol_data, mol_descriptors in zip(all_data, descriptors):
+            mol_data["number_atoms"] = len(mol_data["molecule"])
+            # Copy, so that the cached descriptors can't be modified
+            mol_data.update(copy.deepcopy(mol_descriptors))
 
-        species = [str(s.specie) for s in mol_data["molecule"].sites]
-        mol_data["species"] = dict(Counter(species))
+            species = [str(s.specie) for s in mol_data["molecule"].sites]
+            mol_data["species"] = dict(Counter(species))
 
-        return mol_data
+        return all_data
 
     def get_reaction_data(self, directory=None, mol_ids=None):
         """
@@ -897,38 +1584,54 @@ class MolThermDataProcessor:
         reaction_data["thermo"] = None
 
         if directory is not None:
-            mol_ids = [extract_id(f) for f in listdir(join(self.base_dir, directory))
+            mol_ids = [extract_id(f) for f in self._list_dir(join(self.base_dir, directory))[0]
                         if f.endswith(".mol")]
 
-            component_data = [self.get_molecule_data(m) for m in mol_ids]
+            # The reaction thermo and the molecule records are independent,
+            # so query for both at once
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                thermo = executor.submit(self.extract_reaction_thermo_db,
+                                         directory)
+                component_data = self._fetch_molecule_data(mol_ids)
+                reaction_data["thermo"] = thermo.result()["thermo"]
 
-            reaction_data["thermo"] = self.extract_reaction_thermo_db(directory)["thermo"]
+            # Descriptors may be computed in forked worker processes, so they
+            # are only computed once the query thread has finished
+            self._add_descriptors(component_data)
 
         elif mol_ids is not None:
-            component_data = [self.get_molecule_data(m) for m in mol_ids]
+            component_data = self.get_molecule_data_batch(mol_ids)
 
 
         else:
             raise ValueError("get_reaction_data requires either a directory or "
                              "a set of molecule ids.")
 
-        component_data = sorted(component_data, key=lambda x: len(x["molecule"]))
+        # The product is the largest molecule; on ties, the last one (as
+        # when sorting by size)
+        pro_index = max(range(len(component_data)),
+                        key=lambda i: (len(component_data[i]["molecule"]), i))
 
         reaction_data["dir_name"] = directory
         reaction_data["mol_ids"] = mol_ids
-        reaction_data["product"] = component_data[-1]
-        reaction_data["reactants"] = component_data[:-1]
+        reaction_data["product"] = component_data[pro_index]
+        reaction_data["reactants"] = (component_data[:pro_index] +
+                                      component_data[pro_index + 1:])
 
         if reaction_data["thermo"] is None:
             reaction_data["thermo"] = {}
-            pro_h = reaction_data["product"]["enthalpy"] + reaction_data["product"]["energy"]
-            rct_h = sum(r["enthalpy"] + r["energy"]
-                        for r in reaction_data["reactants"])
-            reaction_data["thermo"]["enthalpy"] = pro_h - rct_h
-
-            pro_s = reaction_data["product"]["entropy"]
-            rct_s = sum(r["entropy"] for r in reaction_data["reactants"])
-            reaction_data["thermo"]["entropy"] = pro_s - rct_s
+            # One row (enthalpy, entropy) per molecule; the reactants are all
+            # rows but the product's
+            mol_thermo = np.array([[m["enthalpy"] + m["energy"], m["entropy"]]
+                                   for m in component_data], dtype=float)
+            rct_mask = np.ones(len(component_data), dtype=bool)
+            rct_mask[pro_index] = False
+            delta = mol_thermo[pro_index] - mol_thermo[rct_mask].sum(axis=0)
+
+            # Plain floats, so that a zero entropy raises ZeroDivisionError
+            delta_h, delta_s = delta.tolist()
+            reaction_data["thermo"]["enthalpy"] = delta_h
+            reaction_data["thermo"]["entropy"] = delta_s
 
             try:
                 reaction_data["thermo"]["t_star"] = reaction_data["thermo"]["enthalpy"] / reaction_data["thermo"]["entropy"]
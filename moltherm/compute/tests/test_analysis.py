@@ -0,0 +1,245 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+from __future__ import division, unicode_literals
+
+"""
+Created on August 20, 2018
+"""
+
+
+__author__ = "Evan Spotte-Smith"
+__version__ = "0.1"
+__maintainer__ = "Evan Spotte-Smith"
+__email__ = "espottesmith@gmail.com"
+__date__ = "August 20, 2018"
+
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+from moltherm.compute.analysis import (MolThermAnalyzer, _count_matrix,
+                                       _fit_linear, _reaction_difference)
+
+try:
+    from sklearn.linear_model import LinearRegression
+except ImportError:
+    LinearRegression = None
+
+
+def make_molecule(mol_id, num_atoms, species, func_groups):
+    return {"mol_id": mol_id,
+            "number_atoms": num_atoms,
+            "molecular_weight": 12.5 * num_atoms,
+            "tpsa": 3.0 * num_atoms,
+            "double_bonds": num_atoms % 3,
+            "triple_bonds": 0,
+            "enthalpy": 4.0 * num_atoms,
+            "energy": -1000.0 * num_atoms,
+            "entropy": 2.5 * num_atoms,
+            "t_star": 0.0,
+            "species": species,
+            "functional_groups": {g: {"count": c}
+                                  for g, c in func_groups.items()}}
+
+
+def make_dataset():
+    a = make_molecule("a", 3, {"C": 1, "O": 1, "H": 1}, {"aldehyde": 1})
+    b = make_molecule("b", 6, {"C": 2, "H": 4}, {"alkene": 1})
+    c = make_molecule("c", 9, {"C": 3, "O": 1, "H": 5},
+                      {"aldehyde": 1, "alkene": 1})
+    d = make_molecule("d", 5, {"N": 1, "H": 4}, {"amine": 1})
+    e = make_molecule("e", 14, {"C": 3, "O": 1, "N": 1, "H": 9},
+                      {"amine": 1, "alkene": 1, "ether": 2})
+    f = make_molecule("f", 4, {"C": 2, "H": 2}, {"alkyne": 1})
+
+    return [
+        {"product": c, "reactants": [a, b], "mol_ids": ["a", "b", "c"],
+         "dir_name": "abc",
+         "thermo": {"enthalpy": -5.0, "entropy": -7.5, "t_star": 666.7}},
+        {"product": e, "reactants": [c, d], "mol_ids": ["c", "d", "e"],
+         "dir_name": "cde",
+         "thermo": {"enthalpy": -3.0, "entropy": -2.0, "t_star": 1500.0}},
+        # No reactants
+        {"product": f, "reactants": [], "mol_ids": ["f"],
+         "dir_name": "f",
+         "thermo": {"enthalpy": 1.0, "entropy": 0.5, "t_star": 2000.0}},
+        # Missing thermo, so reaction values come from the molecules
+        {"product": e, "reactants": [f, a, d], "mol_ids": ["a", "d", "e", "f"],
+         "dir_name": "adef",
+         "thermo": {}},
+    ]
+
+
+class ReactionDifferenceTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        self.counts = rng.randint(0, 3, size=(6, 4)).astype(np.int16)
+        # Reaction 1 has no reactants
+        num_reactants = np.array([2, 0, 3, 1])
+        self.pro_idx = np.array([0, 1, 2, 5])
+        self.rct_idx = np.array([1, 2, 0, 3, 4, 4])
+        self.has_rct = num_reactants > 0
+        self.rct_starts = (np.cumsum(num_reactants) -
+                           num_reactants)[self.has_rct]
+        self.expected = np.array([
+            self.counts[0] - self.counts[1] - self.counts[2],
+            self.counts[1],
+            self.counts[2] - self.counts[0] - self.counts[3] - self.counts[4],
+            self.counts[5] - self.counts[4]])
+
+    def test_dense(self):
+        diff = _reaction_difference(self.counts, self.pro_idx, self.rct_idx,
+                                    self.rct_starts, self.has_rct)
+        self.assertEqual(diff.dtype, np.int32)
+        np.testing.assert_array_equal(diff, self.expected)
+
+    def test_sparse_matches_dense(self):
+        dense = _reaction_difference(self.counts, self.pro_idx, self.rct_idx,
+                                     self.rct_starts, self.has_rct)
+        sparse = _reaction_difference(sp.csr_matrix(self.counts),
+                                      self.pro_idx, self.rct_idx,
+                                      self.rct_starts, self.has_rct)
+        self.assertTrue(sp.isspmatrix_csr(sparse))
+        np.testing.assert_array_equal(sparse.toarray(), dense)
+
+    def test_scalar(self):
+        values = np.arange(6, dtype=float) ** 2
+        diff = _reaction_difference(values, self.pro_idx, self.rct_idx,
+                                    self.rct_starts, self.has_rct)
+        np.testing.assert_allclose(diff, [0 - 1 - 4, 1, 4 - 0 - 9 - 16,
+                                          25 - 16])
+
+    def test_count_matrix(self):
+        counts = [{"C": 2, "H": 4}, {}, {"O": 1, "X": 3}]
+        columns = {"C": 0, "H": 1, "O": 2}
+        expected = [[2, 4, 0], [0, 0, 0], [0, 0, 1]]
+
+        dense = _count_matrix(counts, columns)
+        sparse = _count_matrix(counts, columns, sparse=True)
+
+        np.testing.assert_array_equal(dense, expected)
+        self.assertTrue(sp.isspmatrix_csr(sparse))
+        np.testing.assert_array_equal(sparse.toarray(), expected)
+
+
+@unittest.skipIf(LinearRegression is None,
+                 "scikit-learn not present. Skipping...")
+class FitLinearTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(42)
+        self.in_matrix = rng.randint(0, 4, size=(40, 5)).astype(float)
+        self.in_matrix[:, 4] *= rng.rand(40) * 10
+        coefs = np.array([[1.5], [-2.0], [0.0], [0.7], [3.2]])
+        self.dep_matrix = (self.in_matrix.dot(coefs) + 4.0 +
+                           rng.normal(scale=0.5, size=(40, 1)))
+
+    def _check(self, in_matrix, rtol=1e-7):
+        coefficients, intercept, r_squared = _fit_linear(in_matrix,
+                                                         self.dep_matrix)
+        model = LinearRegression().fit(in_matrix, self.dep_matrix)
+
+        self.assertEqual(coefficients.shape, model.coef_.shape)
+        self.assertEqual(intercept.shape, model.intercept_.shape)
+        np.testing.assert_allclose(coefficients, model.coef_, rtol=rtol,
+                                   atol=1e-8)
+        np.testing.assert_allclose(intercept, model.intercept_, rtol=rtol,
+                                   atol=1e-8)
+        self.assertAlmostEqual(r_squared,
+                               model.score(in_matrix, self.dep_matrix))
+
+    def test_dense(self):
+        self._check(self.in_matrix)
+
+    def test_sparse(self):
+        self._check(sp.csr_matrix(self.in_matrix), rtol=1e-5)
+
+    def test_rank_deficient(self):
+        # Duplicated and linearly dependent columns; the minimum-norm
+        # solution is expected, as from LinearRegression
+        in_matrix = np.column_stack([self.in_matrix, self.in_matrix[:, 0],
+                                     self.in_matrix[:, 1] +
+                                     self.in_matrix[:, 3]])
+        self.in_matrix = in_matrix
+        self._check(in_matrix)
+        self._check(sp.csr_matrix(in_matrix), rtol=1e-5)
+
+    def test_inputs_unchanged(self):
+        in_matrix = self.in_matrix.copy()
+        dep_matrix = self.dep_matrix.copy()
+        _fit_linear(self.in_matrix, self.dep_matrix)
+        np.testing.assert_array_equal(self.in_matrix, in_matrix)
+        np.testing.assert_array_equal(self.dep_matrix, dep_matrix)
+
+
+class AddReactionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = make_dataset()
+        self.kwargs = {"in_features": ["number_atoms", "molecular_weight",
+                                       "tpsa", "species",
+                                       "functional_groups"],
+                       "dep_features": ["enthalpy", "entropy", "t_star"]}
+        self.full = MolThermAnalyzer(self.dataset, **self.kwargs)
+
+    def assertDatasetsEqual(self, first, second):
+        for kind in ["molecules", "reactions"]:
+            self.assertEqual(sorted(first[kind].keys()),
+                             sorted(second[kind].keys()))
+            for feature, values in first[kind].items():
+                other = second[kind][feature]
+                self.assertEqual(sp.issparse(values), sp.issparse(other))
+                if sp.issparse(values):
+                    values = values.toarray()
+                    other = other.toarray()
+                self.assertEqual(values.dtype, other.dtype)
+                self.assertEqual(values.shape, other.shape)
+                self.assertEqual(values.tolist(), other.tolist())
+
+    def test_matches_full_setup(self):
+        for start in range(len(self.dataset)):
+            analyzer = MolThermAnalyzer(self.dataset[:start],
+                                        species=self.full.species,
+                                        func_groups=self.full.func_groups,
+                                        **self.kwargs)
+            for datapoint in self.dataset[start:]:
+                analyzer.add_reaction(datapoint)
+
+            self.assertDatasetsEqual(analyzer.dataset, self.full.dataset)
+
+    def test_reaction_values(self):
+        reactions = self.full.dataset["reactions"]
+        molecules = {d["mol_id"]: d for r in self.dataset
+                     for d in [r["product"]] + r["reactants"]}
+
+        # Reaction with thermo
+        self.assertEqual(reactions["enthalpy"][0], -5.0)
+        # No reactants: the product's own counts
+        fg = reactions["functional_groups"].toarray()
+        col = self.full._fg_col["alkyne"]
+        self.assertEqual(fg[2, col], 1)
+        # Missing thermo: product minus reactants, from the molecules
+        expected = molecules["e"]["enthalpy"] - sum(
+            molecules[m]["enthalpy"] for m in ["f", "a", "d"])
+        self.assertAlmostEqual(reactions["enthalpy"][3], expected)
+        self.assertEqual(reactions["ids"][2], ["f"])
+
+    def test_clears_matrices(self):
+        analyzer = MolThermAnalyzer(self.dataset[:3],
+                                    species=self.full.species,
+                                    func_groups=self.full.func_groups,
+                                    **self.kwargs)
+        before = analyzer._get_matrices(["number_atoms"], "entropy")[0]
+        analyzer.add_reaction(self.dataset[3])
+        after = analyzer._get_matrices(["number_atoms"], "entropy")[0]
+
+        self.assertEqual(before.shape[0], 3)
+        self.assertEqual(after.shape[0], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
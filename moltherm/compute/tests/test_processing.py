@@ -0,0 +1,205 @@
+# coding: utf-8
+# Copyright (c) Pymatgen Development Team.
+# Distributed under the terms of the MIT License.
+
+from __future__ import division, unicode_literals
+
+"""
+Created on August 20, 2018
+"""
+
+
+__author__ = "Evan Spotte-Smith"
+__version__ = "0.1"
+__maintainer__ = "Evan Spotte-Smith"
+__email__ = "espottesmith@gmail.com"
+__date__ = "August 20, 2018"
+
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+from unittest import mock
+
+from pymatgen.core.structure import Molecule
+
+from moltherm.compute.outputs import QCOutput
+from moltherm.compute.processing import (MolThermDataProcessor, THERMO_FIELDS,
+                                         _combine_thermo, _scrape_fields,
+                                         _scrape_completion,
+                                         _scrape_initial_species)
+from moltherm.compute.utils import associate_qchem_to_mol
+
+test_dir = os.path.join(os.path.dirname(__file__), "..", "..", "..",
+                        "test_files", "qchem")
+
+output_files = ["rct_1.out.opt_0", "rct_1.out.freq_0", "rct_1.out.sp_0"]
+
+
+class OutputScrapingTest(unittest.TestCase):
+    """
+    The scrapers in processing read only a few fields of an output, in place
+    of QCOutput; they should agree with QCOutput wherever it reports a value.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Compressed copies of each output, as QCOutput reads through zopen
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.gz_files = {}
+        for name in output_files:
+            gz_path = os.path.join(cls.tmp_dir, name + ".gz")
+            with open(os.path.join(test_dir, name), "rb") as f_in:
+                with gzip.open(gz_path, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            cls.gz_files[name] = gz_path
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def _check_against_qcout(self, path):
+        data = QCOutput(path).data
+        fields = _scrape_fields(path)
+
+        checked = 0
+        for field in THERMO_FIELDS:
+            # QCOutput only parses some fields for certain kinds of jobs
+            if data.get(field) not in (None, []):
+                self.assertAlmostEqual(fields[field], data[field])
+                checked += 1
+        self.assertGreater(checked, 0)
+
+        self.assertEqual(_scrape_initial_species(path),
+                         tuple(data["species"]))
+        self.assertEqual(_scrape_completion(path), bool(data["completion"]))
+
+    def test_plain_outputs(self):
+        for name in output_files:
+            self._check_against_qcout(os.path.join(test_dir, name))
+
+    def test_compressed_outputs(self):
+        for name in output_files:
+            self._check_against_qcout(self.gz_files[name])
+
+    def test_last_sp_energy(self):
+        # As in QCOutput, the last SCF energy of a single-point job is used
+        fields = _scrape_fields(os.path.join(test_dir, "rct_1.out.sp_0"))
+        self.assertAlmostEqual(fields["final_energy_sp"], -114.5071436291)
+
+    def test_incomplete_output(self):
+        path = os.path.join(self.tmp_dir, "rct_2.out.freq_0")
+        with open(os.path.join(test_dir, "rct_1.out.freq_0")) as f:
+            text = f.read()
+        with open(path, "w") as f:
+            f.write(text[:text.index("Total job time")])
+
+        self.assertFalse(_scrape_completion(path))
+        self.assertAlmostEqual(_scrape_fields(path)["enthalpy"], 19.827)
+
+    def test_empty_output(self):
+        path = os.path.join(self.tmp_dir, "rct_3.out.opt_0")
+        open(path, "w").close()
+
+        self.assertEqual(_scrape_fields(path),
+                         {field: None for field in THERMO_FIELDS})
+        self.assertFalse(_scrape_completion(path))
+        self.assertIsNone(_scrape_initial_species(path))
+
+
+
+class ReactionThermoFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        rxn_dir = os.path.join(self.base_dir, "rxn_0")
+        os.mkdir(rxn_dir)
+
+        with open(os.path.join(test_dir, "rct_1.out.freq_0")) as f:
+            freq_text = f.read()
+
+        # Molecule ids "0" and "10" are substrings of each other's output
+        # names (and "0" of every job suffix). Molecule "0" only has an opt
+        # output, so picking up any output of "10" shows in the totals.
+        self.enthalpies = {"rct_10": 10.0, "pro_2": 35.5}
+        for stem in ["rct_0", "rct_10", "pro_2"]:
+            open(os.path.join(rxn_dir, stem + ".mol"), "w").close()
+            shutil.copy(os.path.join(test_dir, "rct_1.out.opt_0"),
+                        os.path.join(rxn_dir, stem + ".out.opt_0"))
+        for stem, enthalpy in self.enthalpies.items():
+            with open(os.path.join(rxn_dir, stem + ".out.freq_0"), "w") as f:
+                f.write(freq_text.replace("19.827",
+                                          "{:.3f}".format(enthalpy)))
+            shutil.copy(os.path.join(test_dir, "rct_1.out.sp_0"),
+                        os.path.join(rxn_dir, stem + ".out.sp_0"))
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_outputs_matched_by_exact_id(self):
+        processor = MolThermDataProcessor(
+            self.base_dir, db_file=os.path.join(self.base_dir, "db.json"))
+
+        result = processor.extract_reaction_thermo_files("rxn_0")
+
+        opt_energy = -114.502011327145
+        sp_energy = -114.5071436291
+        entropy = 52.954
+        enthalpy, entropy = _combine_thermo(
+            [sp_energy, self.enthalpies["pro_2"], entropy],
+            [opt_energy + sp_energy, self.enthalpies["rct_10"], entropy])
+
+        self.assertEqual(sorted(result["reactant_ids"]), ["0", "10"])
+        self.assertEqual(result["product_ids"], ["2"])
+        self.assertAlmostEqual(result["thermo"]["enthalpy"], enthalpy)
+        self.assertAlmostEqual(result["thermo"]["entropy"], entropy)
+        self.assertEqual(result["thermo"]["has_sp"],
+                         {"rct_0": False, "rct_10": True, "pro_2": True})
+
+
+def formaldehyde(*args, **kwargs):
+    # Structure of test_files/qchem/rct_1.mol
+    return Molecule(["C", "O", "H", "H"],
+                    [[0.0, 0.0, -0.564], [0.0, 0.0, 0.564],
+                     [0.0, 0.938, -1.155], [0.0, -0.938, -1.155]])
+
+
+# .mol files are read through Open Babel, which may not be present
+@mock.patch("moltherm.compute.utils.Molecule.from_file", formaldehyde)
+class CompletedMoleculesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.rxn_dir = os.path.join(self.base_dir, "rxn_1")
+        os.mkdir(self.rxn_dir)
+        for name in output_files + ["rct_1.mol"]:
+            shutil.copy(os.path.join(test_dir, name), self.rxn_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+
+    def test_scraped_species_match_qcout(self):
+        expected = associate_qchem_to_mol(self.base_dir, "rxn_1")
+        mapping = associate_qchem_to_mol(
+            self.base_dir, "rxn_1",
+            out_species=lambda p: list(_scrape_initial_species(p)))
+
+        self.assertEqual(sorted(mapping["rct_1.mol"]["out"]),
+                         sorted(output_files))
+        self.assertEqual(mapping, expected)
+
+    def test_completed_without_parsing(self):
+        processor = MolThermDataProcessor(
+            self.base_dir, db_file=os.path.join(self.base_dir, "db.json"))
+
+        # Completed molecules should be found without parsing any output
+        with mock.patch("moltherm.compute.utils.qcout_data",
+                        side_effect=AssertionError("output was parsed")):
+            self.assertEqual(processor.get_completed_molecules(), {"1"})
+            self.assertEqual(processor.get_completed_molecules(extra=True),
+                             {("1", "rxn_1", "rct_1.mol")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
-from os import listdir, remove, rename
-from os.path import join, isfile, isdir
+from os import listdir, remove, rename, scandir, stat
+from os.path import join, isfile, isdir, abspath
 import operator
+from functools import lru_cache
 import shutil
 
 from bs4 import BeautifulSoup
@@ -13,6 +14,18 @@ from moltherm.compute.inputs import QCInput
 from moltherm.compute.outputs import QCOutput
 
 
+@lru_cache(maxsize=1024)
+def _get_molecule_by_mtime(molfile, mtime):
+    obmol = BabelMolAdaptor.from_file(molfile, file_format="mol")
+    # OBMolecule does not contain pymatgen Molecule information
+    # So, we need to wrap the obmol in a BabelMolAdapter and extract
+    obmol.add_hydrogen()
+    obmol.make3d()
+    obmol.localopt()
+
+    return obmol.pymatgen_mol
+
+
 def get_molecule(molfile):
     """
     Create pymatgen Molecule object from molecule data file.
@@ -20,18 +33,39 @@ def get_molecule(molfile):
     In addition to parsing the input, this function also performs a conformer
     search to get a reasonable starting structure.
 
+    Results are cached by absolute path and modification time, so repeated
+    calls for an unchanged file skip the conformer search.
+
     :param molfile: Absolute path to structure file (.mol, .sdf, etc.)
     :return: Molecule.
     """
 
-    obmol = BabelMolAdaptor.from_file(molfile, file_format="mol")
-    # OBMolecule does not contain pymatgen Molecule information
-    # So, we need to wrap the obmol in a BabelMolAdapter and extract
-    obmol.add_hydrogen()
-    obmol.make3d()
-    obmol.localopt()
+    molfile = abspath(molfile)
+    # Hand out a copy so that callers can't modify the cached Molecule
+    return _get_molecule_by_mtime(molfile, stat(molfile).st_mtime_ns).copy()
+
+
+# Only the parsed data is cached, not the QCOutput (which also holds the
+# full text of the output), so that the cache stays small
+@lru_cache(maxsize=128)
+def _qcout_data_by_mtime(qoutfile, mtime):
+    return QCOutput(qoutfile).data
 
-    return obmol.pymatgen_mol
+
+def qcout_data(qoutfile):
+    """
+    Parse a QChem output file.
+
+    Parsed outputs are cached by absolute path and modification time, so the
+    same output can be requested many times while only being parsed once.
+
+    :param qoutfile: Path to the QChem output file (.out)
+    :return: dict, as QCOutput.data. This dict is shared between calls, and
+        should not be modified.
+    """
+
+    qoutfile = abspath(qoutfile)
+    return _qcout_data_by_mtime(qoutfile, stat(qoutfile).st_mtime_ns)
 
 
 def generate_opt_input(molfile, qinfile, basis_set="6-311++G*",
@@ -66,13 +100,13 @@ def generate_freq_input(qoutfile, qinfile, basis_set="6-311++G*",
     :return:
     """
 
-    output = QCOutput(qoutfile)
+    output = qcout_data(qoutfile)
 
-    if len(output.data.get("molecule_from_optimized_geometry", [])) > 0:
-        mol = output.data["molecule_from_optimized_geometry"]
+    if len(output.get("molecule_from_optimized_geometry", [])) > 0:
+        mol = output["molecule_from_optimized_geometry"]
     else:
         try:
-            mol = output.data["molecule_from_last_geometry"]
+            mol = output["molecule_from_last_geometry"]
         except KeyError:
             raise RuntimeError("No molecule to use as input")
 
@@ -93,13 +127,13 @@ def generate_single_point_input(qoutfile, qinfile, basis_set="6-311++G*",
     :return:
     """
 
-    output = QCOutput(qoutfile)
+    output = qcout_data(qoutfile)
 
-    if len(output.data.get("molecule_from_optimized_geometry", [])) > 0:
-        mol = output.data["molecule_from_optimized_geometry"]
+    if len(output.get("molecule_from_optimized_geometry", [])) > 0:
+        mol = output["molecule_from_optimized_geometry"]
     else:
         try:
-            mol = output.data["molecule_from_last_geometry"]
+            mol = output["molecule_from_last_geometry"]
         except KeyError:
             raise RuntimeError("No molecule to use as input")
 
@@ -192,28 +226,39 @@ def get_reactions_common_solvent(base_dir, solvents, outdir=None):
         return common_solvent
 
 
-def associate_qchem_to_mol(base_dir, directory):
+def associate_qchem_to_mol(base_dir, directory, out_species=None):
     """
     Assign all .in and .out files in a directory to one of the .mol files in that
     directory, based on the non-H atoms in those molecules.
 
     :param directory:
+    :param out_species: Function taking the path of a QChem output file and
+        returning the species of its initial molecule, as strs. By default,
+        the output is parsed with QCOutput; callers that only need the
+        species can pass something cheaper.
     :return:
     """
 
     base_path = join(base_dir, directory)
 
-    mol_files = [f for f in listdir(base_path) if isfile(join(base_path, f))
-                 and f.endswith(".mol")]
+    # scandir provides the file type without a separate stat() per entry
+    with scandir(base_path) as entries:
+        files = [e.name for e in entries if e.is_file()]
+
+    mol_files = [f for f in files if f.endswith(".mol")]
     # Note: This will catch .in and .out files for incomplete computations
     # TODO: What's the best way to filter these out?
-    in_files = [f for f in listdir(base_path) if isfile(join(base_path, f))
-                and ".in" in f and not f.startswith("atomate")]
-    out_files = [f for f in listdir(base_path) if isfile(join(base_path, f))
-                 and ".out" in f and not f.startswith("atomate")]
+    in_files = [f for f in files if ".in" in f and not f.startswith("atomate")]
+    out_files = [f for f in files if ".out" in f and not f.startswith("atomate")]
 
     mapping = {mol: {"in": [], "out": []} for mol in mol_files}
 
+    # Read each .mol file once, rather than once per .in and .out file
+    mol_species_of = {}
+    for mf in mol_files:
+        mol_mol = Molecule.from_file(join(base_path, mf))
+        mol_species_of[mf] = [str(s) for s in mol_mol.species if str(s) != "H"]
+
     for file in in_files:
         qcin = QCInput.from_file(join(base_path, file))
         file_mol = qcin.molecule
@@ -221,32 +266,31 @@ def associate_qchem_to_mol(base_dir, directory):
         file_species = [str(s) for s in file_mol.species if str(s) != "H"]
 
         for mf in mol_files:
-            mol_mol = Molecule.from_file(join(base_path, mf))
-            mol_species = [str(s) for s in mol_mol.species if str(s) != "H"]
             # Preserve initial order because that gives a better guarantee
             # That the two are actually associated
-            if mol_species == file_species:
+            if mol_species_of[mf] == file_species:
                 mapping[mf]["in"].append(file)
                 break
 
     for file in out_files:
-        qcout = QCOutput(join(base_path, file))
-        file_mol = qcout.data["initial_molecule"]
-        file_species = [str(s) for s in file_mol.species if str(s) != "H"]
+        if out_species is None:
+            file_mol = qcout_data(join(base_path, file))["initial_molecule"]
+            species = [str(s) for s in file_mol.species]
+        else:
+            species = out_species(join(base_path, file))
+        file_species = [s for s in species if s != "H"]
 
         for mf in mol_files:
-            mol_mol = Molecule.from_file(join(base_path, mf))
-            mol_species = [str(s) for s in mol_mol.species if str(s) != "H"]
-
             # Preserve initial order because that gives a better guarantee
             # That the two are actually associated
-            if mol_species == file_species:
+            if mol_species_of[mf] == file_species:
                 mapping[mf]["out"].append(file)
                 break
 
     return mapping
 
 
+@lru_cache(maxsize=None)
 def extract_id(string):
     """
     Extract unique molecule ID from a filepath.
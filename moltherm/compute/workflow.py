@@ -16,8 +16,8 @@ from pymatgen.analysis.molecule_structure_comparator import MoleculeStructureCom
 
 from moltherm.compute.fireworks import OptFreqSPFW, SinglePointFW
 from moltherm.compute.inputs import QCInput
-from moltherm.compute.outputs import QCOutput
-from moltherm.compute.utils import get_molecule, extract_id, associate_qchem_to_mol
+from moltherm.compute.utils import (get_molecule, extract_id, qcout_data,
+                                     associate_qchem_to_mol)
 from moltherm.compute.jobs import perturb_coordinates
 
 import networkx as nx
@@ -338,14 +338,14 @@ class MolThermWorkflow:
                 # not complete, then we may proceed
                 for out_file in out_files:
                     if "freq" in out_file:
-                        freq_out = QCOutput(join(path, out_file))
+                        freq_out = qcout_data(join(path, out_file))
 
-                        if freq_out.data.get("completion", []):
+                        if freq_out.get("completion", []):
                            freq_complete = True
                     elif "sp" in out_file:
-                        sp_out = QCOutput(join(path, out_file))
+                        sp_out = qcout_data(join(path, out_file))
 
-                        if sp_out.data.get("completion", []):
+                        if sp_out.get("completion", []):
                             sp_complete = True
 
                 if freq_complete and not sp_complete:
@@ -544,7 +544,7 @@ class MolThermWorkflow:
         for mol in collection.find({}):
             frequencies = mol["output"]["frequencies"]
 
-            if any([True if x < 0 else False for x in frequencies]):
+            if any(x < 0 for x in frequencies):
                 min_molecule_perturb_scale = 0.1
                 max_molecule_perturb_scale = 0.3
                 scale_grid = 10
@@ -5,9 +5,12 @@ setup(
     version='0.0.1',
     packages=['moltherm', 'moltherm.react', 'moltherm.react.tests',
               'moltherm.utils', 'moltherm.screen', 'moltherm.screen.datasets',
-              'moltherm.compute'],
+              'moltherm.compute', 'moltherm.compute.tests'],
     url='github.com/peiyuan-yu/Moltherm',
     license='MIT',
+    install_requires=['numpy', 'scipy'],
+    # Only used to check regression results against LinearRegression
+    extras_require={'test': ['scikit-learn']},
     author='Peiyuan Yu, Qi Wang, Evan Spotte-Smith',
     author_email='peiyuan@lbl.gov',
     description='High-throughput generation, optimization and calculation of molecules and chemical reactions.'